@@ -3,6 +3,9 @@ from models.models import Database
 from routes.student_routes import student_bp
 from routes.incharge_routes import incharge_bp
 from routes.attendance_routes import attendance_bp
+from utils.vision import get_face_encoder, get_gallery_cache
+from utils.session_store import create_session_interface
+from utils.warmup import warm_up, mark_ready, is_ready, warmup_state
 import os
 from datetime import timedelta
 from config import config
@@ -14,11 +17,30 @@ app.config.from_object(config)
 # Initialize database
 db = Database()
 
+# Session data lives server-side; the cookie only carries the session id
+app.session_interface = create_session_interface(config, db)
+
 # Register blueprints
 app.register_blueprint(student_bp, url_prefix='/student')
 app.register_blueprint(incharge_bp, url_prefix='/incharge')
 app.register_blueprint(attendance_bp, url_prefix='/attendance')
 
+# Warm up before this worker accepts traffic (gunicorn imports the app
+# in each worker, or once in the master with --preload)
+if app.config.get('WARMUP_ON_BOOT'):
+    warm_up(get_face_encoder(), get_gallery_cache(db))
+else:
+    mark_ready()
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready')
+def ready():
+    status = 200 if is_ready() else 503
+    return jsonify(dict(warmup_state)), status
+
 @app.route('/')
 def home():
     return render_template('home.html')
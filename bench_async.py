@@ -0,0 +1,75 @@
+"""
+Benchmark the async scan endpoint against the sync one.
+
+Starts a local gunicorn for each variant and replays the same face JPEGs at
+each target rate using the load generator in load_test.py:
+
+  sync          -> /attendance/process-attendance        on plain sync workers (-w W)
+  sync-gthread  -> /attendance/process-attendance        on threaded workers (-w W -k gthread --threads T)
+  async         -> /attendance/process-attendance-async  on threaded workers (-w W -k gthread --threads T)
+
+sync-gthread separates the gain from the threaded worker class from the gain
+of the async endpoint itself.
+
+    python bench_async.py --faces samples/ --workers 2 --threads 100 --rates 5,10,20,40 --duration 30
+"""
+import argparse
+import csv
+from types import SimpleNamespace
+
+from load_test import load_faces, run_against, start_gunicorn, stop_gunicorn, print_table
+
+# name -> (endpoint, run on gthread workers)
+VARIANTS = {
+    'sync': ('/attendance/process-attendance', False),
+    'sync-gthread': ('/attendance/process-attendance', True),
+    'async': ('/attendance/process-attendance-async', True)
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Async vs sync scan endpoint benchmark')
+    parser.add_argument('--faces', required=True, help='Directory of pre-recorded face JPEGs')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for both variants')
+    parser.add_argument('--threads', type=int, default=100, help='Threads per gthread worker (gthread variants)')
+    parser.add_argument('--rates', default='5,10,20', help='Comma-separated target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per run')
+    parser.add_argument('--incharges', type=int, default=5, help='Synthetic incharges to log in')
+    parser.add_argument('--bus-base', type=int, default=900, help='Synthetic incharge i gets bus --bus-base + i')
+    parser.add_argument('--concurrency', type=int, default=256, help='Maximum requests in flight from this client')
+    parser.add_argument('--port', type=int, default=5056, help='Port for locally started gunicorn')
+    parser.add_argument('--csv', help='Write results to this CSV file')
+    args = parser.parse_args(argv)
+
+    images = load_faces(args.faces)
+    rates = [float(r) for r in args.rates.split(',') if r.strip()]
+
+    rows = []
+    for variant, (path, gthread) in VARIANTS.items():
+        gunicorn_args = [] if not gthread else ['-k', 'gthread', '--threads', str(args.threads)]
+        print(f'🚀 {variant}: gunicorn -w {args.workers} {" ".join(gunicorn_args)}')
+        proc, base_url = start_gunicorn(args.workers, args.port, gunicorn_args)
+        try:
+            for rate in rates:
+                run_args = SimpleNamespace(incharges=args.incharges, bus_base=args.bus_base, rate=rate,
+                                           duration=args.duration, concurrency=args.concurrency, path=path)
+                result = run_against(base_url, run_args, images)
+                result['workers'] = f'{variant}/{args.workers}'
+                rows.append(result)
+                print_table([result])
+        finally:
+            stop_gunicorn(proc)
+
+    print('\n📊 Sync vs sync on gthread vs async')
+    print_table(rows)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f'💾 Wrote {args.csv}')
+
+
+if __name__ == '__main__':
+    main()
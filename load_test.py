@@ -0,0 +1,298 @@
+"""
+Load generator simulating the morning boarding rush.
+
+Logs in N synthetic bus incharges through the (fixed-code) OTP flow and fires
+/attendance/process-attendance with pre-recorded face JPEGs at a target rate.
+Latency is measured from each request's *scheduled* send time, so a server
+that falls behind shows up as growing latency instead of a silently lower
+request rate.
+
+Run against an already running server:
+    python load_test.py --url http://127.0.0.1:5000 --faces samples/ --incharges 10 --rate 20 --duration 60
+
+Or sweep local gunicorn worker counts to get a throughput-versus-workers curve:
+    python load_test.py --faces samples/ --workers 1,2,4,8 --rate 40 --duration 60 --csv curve.csv
+
+Synthetic incharges are created on first use (email loadtest<i>@example.com,
+bus number --bus-base + i). Enroll students on those buses if you want the
+load to include successful matches; otherwise each scan still pays the full
+face encoding before being rejected.
+
+Each synthetic incharge sends far more scans than a real one, so start the
+server with the per-incharge limits off (locally started gunicorn gets this
+by default):
+    SCAN_RATE_PER_SECOND=1000 SCAN_BURST=1000 SCAN_COALESCE_WINDOW=0
+"""
+import argparse
+import base64
+import csv
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEMO_OTP = '123456'
+REQUEST_TIMEOUT = 60
+
+
+def load_faces(faces_dir):
+    """Read every JPEG in faces_dir and return them as data URLs"""
+    images = []
+    for filename in sorted(os.listdir(faces_dir)):
+        if filename.lower().endswith(('.jpg', '.jpeg')):
+            with open(os.path.join(faces_dir, filename), 'rb') as f:
+                encoded = base64.b64encode(f.read()).decode('ascii')
+            images.append(f'data:image/jpeg;base64,{encoded}')
+    if not images:
+        raise SystemExit(f'No .jpg/.jpeg files found in {faces_dir}')
+    return images
+
+
+def _verify(session, url, payload):
+    """
+    POST an OTP verification. OTPs are kept in the shared database store, so
+    any worker can check a code another worker issued.
+    """
+    return session.post(url, json=payload, timeout=REQUEST_TIMEOUT).json()
+
+
+def login_incharge(base_url, index, bus_base):
+    """Sign up (if needed) and log in synthetic incharge #index, returning its cookies"""
+    email = f'loadtest{index}@example.com'
+    session = requests.Session()
+
+    result = session.post(f'{base_url}/incharge/login',
+                          data={'login_id': email, 'login_type': 'email'},
+                          timeout=REQUEST_TIMEOUT).json()
+
+    if not result.get('success') and result.get('message') == 'Incharge not found':
+        signup = session.post(f'{base_url}/incharge/signup', json={
+            'name': f'Load Test {index}',
+            'email': email,
+            'phone': f'9{index:09d}',
+            'bus_number': bus_base + index
+        }, timeout=REQUEST_TIMEOUT).json()
+        if not signup.get('success'):
+            raise RuntimeError(f'Signup failed for {email}: {signup.get("message")}')
+
+        verified = _verify(session, f'{base_url}/incharge/verify-otp',
+                           {'otp': DEMO_OTP, 'bus_password': 'loadtest'})
+        if not verified.get('success'):
+            raise RuntimeError(f'Signup OTP failed for {email}: {verified.get("message")}')
+
+        result = session.post(f'{base_url}/incharge/login',
+                              data={'login_id': email, 'login_type': 'email'},
+                              timeout=REQUEST_TIMEOUT).json()
+
+    if not result.get('success'):
+        raise RuntimeError(f'Login failed for {email}: {result.get("message")}')
+
+    verified = _verify(session, f'{base_url}/incharge/verify-login', {'otp': DEMO_OTP})
+    if not verified.get('success'):
+        raise RuntimeError(f'Login OTP failed for {email}: {verified.get("message")}')
+
+    return session.cookies.get_dict()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadRun:
+    """One open-loop run at a fixed target rate"""
+
+    def __init__(self, base_url, cookies, images, rate, duration,
+                 concurrency=64, path='/attendance/process-attendance'):
+        self.url = f'{base_url}{path}'
+        self.cookies = cookies
+        self.images = images
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.latencies = []
+        self.outcomes = {'ok': 0, 'rejected': 0, 'error': 0}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _http(self):
+        # requests.Session is not thread-safe; keep one per pool thread
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _fire(self, index, scheduled_at):
+        cookies = self.cookies[index % len(self.cookies)]
+        image = self.images[index % len(self.images)]
+        try:
+            response = self._http().post(self.url, json={'image': image},
+                                         cookies=cookies, timeout=REQUEST_TIMEOUT)
+            if response.status_code != 200:
+                outcome = 'error'
+            else:
+                body = response.json()
+                if body.get('success'):
+                    outcome = 'ok'
+                elif 'error' in body.get('message', '').lower():
+                    outcome = 'error'
+                else:
+                    outcome = 'rejected'
+        except (requests.RequestException, ValueError):
+            outcome = 'error'
+
+        latency = time.perf_counter() - scheduled_at
+        with self.lock:
+            self.latencies.append(latency)
+            self.outcomes[outcome] += 1
+
+    def run(self):
+        total = int(self.rate * self.duration)
+        interval = 1.0 / self.rate
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i in range(total):
+                scheduled_at = start + i * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._fire, i, scheduled_at)
+
+        elapsed = time.perf_counter() - start
+        return self.summary(total, elapsed)
+
+    def summary(self, sent, elapsed):
+        latencies = sorted(self.latencies)
+        completed = len(latencies)
+        return {
+            'offered_rps': self.rate,
+            'sent': sent,
+            'completed': completed,
+            'throughput_rps': completed / elapsed if elapsed else 0.0,
+            'ok': self.outcomes['ok'],
+            'rejected': self.outcomes['rejected'],
+            'errors': self.outcomes['error'],
+            'error_rate': self.outcomes['error'] / completed if completed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': (latencies[-1] * 1000) if latencies else 0.0
+        }
+
+
+def start_gunicorn(workers, port, extra_args=()):
+    """Start a local gunicorn serving app:app and wait until it answers"""
+    cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers),
+           '-b', f'127.0.0.1:{port}', *extra_args, 'app:app']
+    # Measure inference, not the per-incharge rate limit and coalescing; keep
+    # OTPs in the shared store so any worker can verify the login codes
+    env = dict(os.environ)
+    for key, value in (('SCAN_RATE_PER_SECOND', '1000'), ('SCAN_BURST', '1000'), ('SCAN_COALESCE_WINDOW', '0'),
+                       ('OTP_STORE', 'database')):
+        env.setdefault(key, value)
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {proc.returncode}')
+        try:
+            if requests.get(f'{base_url}/', timeout=2).status_code == 200:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    proc.terminate()
+    raise RuntimeError('gunicorn did not become ready within 120s')
+
+
+def stop_gunicorn(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def run_against(base_url, args, images):
+    cookies = [login_incharge(base_url, i, args.bus_base) for i in range(args.incharges)]
+    print(f'🔐 Logged in {len(cookies)} synthetic incharges')
+    run = LoadRun(base_url, cookies, images, args.rate, args.duration,
+                  concurrency=args.concurrency, path=args.path)
+    return run.run()
+
+
+def print_table(rows):
+    columns = ['workers', 'offered_rps', 'throughput_rps', 'completed',
+               'error_rate', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    print(' | '.join(f'{c:>14}' for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row.get(c, '')
+            cells.append(f'{value:>14.3f}' if isinstance(value, float) else f'{value!s:>14}')
+        print(' | '.join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Morning boarding rush load generator')
+    parser.add_argument('--url', default='http://127.0.0.1:5000',
+                        help='Server to target when --workers is not given')
+    parser.add_argument('--faces', required=True, help='Directory of pre-recorded face JPEGs')
+    parser.add_argument('--incharges', type=int, default=5, help='Synthetic incharges to log in')
+    parser.add_argument('--bus-base', type=int, default=900,
+                        help='Synthetic incharge i is assigned bus --bus-base + i')
+    parser.add_argument('--rate', type=float, default=10.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per run')
+    parser.add_argument('--concurrency', type=int, default=64,
+                        help='Maximum requests in flight from this client')
+    parser.add_argument('--path', default='/attendance/process-attendance',
+                        help='Scan endpoint to target')
+    parser.add_argument('--workers', help='Comma-separated gunicorn worker counts to sweep, e.g. 1,2,4,8')
+    parser.add_argument('--port', type=int, default=5055, help='Port for locally started gunicorn')
+    parser.add_argument('--gunicorn-arg', action='append', default=[],
+                        help='Extra argument passed to gunicorn (repeatable)')
+    parser.add_argument('--csv', help='Write results to this CSV file')
+    args = parser.parse_args(argv)
+
+    images = load_faces(args.faces)
+    print(f'🖼️  Loaded {len(images)} face images from {args.faces}')
+
+    rows = []
+    if args.workers:
+        for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+            print(f'🚀 Starting gunicorn with {workers} worker(s)')
+            proc, base_url = start_gunicorn(workers, args.port, args.gunicorn_arg)
+            try:
+                result = run_against(base_url, args, images)
+            finally:
+                stop_gunicorn(proc)
+            result['workers'] = workers
+            rows.append(result)
+            print_table([result])
+    else:
+        result = run_against(args.url.rstrip('/'), args, images)
+        result['workers'] = '-'
+        rows.append(result)
+
+    print('\n📊 Throughput vs workers')
+    print_table(rows)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f'💾 Wrote {args.csv}')
+
+
+if __name__ == '__main__':
+    main()
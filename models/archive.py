@@ -0,0 +1,100 @@
+import re
+from datetime import date
+
+# Closed academic terms are moved out of the hot `attendance` table into one
+# archive table per term, registered in `attendance_terms`. Current-term
+# queries keep hitting the small hot table; history queries go through
+# attendance_source(), which UNIONs in only the archives overlapping the
+# requested date range.
+
+TERM_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_]{1,40}$')
+ATTENDANCE_COLUMNS = 'id, university_id, bus_number, date, timestamp, status'
+
+
+def archive_table_name(term):
+    if not TERM_NAME_PATTERN.match(term):
+        raise ValueError('Term name may only contain letters, digits and underscores')
+    return f'attendance_archive_{term.lower()}'
+
+
+def list_terms(cursor, date_from=None, date_to=None):
+    """
+    Archived terms, optionally only those overlapping [date_from, date_to]
+    Returns: list of (term, start_date, end_date, table_name, row_count)
+    """
+    sql = 'SELECT term, start_date, end_date, table_name, row_count FROM attendance_terms'
+    conditions, params = [], []
+    if date_to:
+        conditions.append('start_date <= ?')
+        params.append(date_to)
+    if date_from:
+        conditions.append('end_date >= ?')
+        params.append(date_from)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    cursor.execute(sql + ' ORDER BY start_date', params)
+    return cursor.fetchall()
+
+
+def attendance_source(cursor, date_from=None, date_to=None):
+    """
+    FROM-clause source for attendance rows in [date_from, date_to]
+    Returns the plain hot table when no archived term overlaps the range,
+    otherwise a UNION ALL subquery over the hot table and those archives.
+    """
+    archives = list_terms(cursor, date_from, date_to)
+    if not archives:
+        return 'attendance'
+
+    selects = [f'SELECT {ATTENDANCE_COLUMNS} FROM attendance']
+    selects += [f'SELECT {ATTENDANCE_COLUMNS} FROM {row[3]}' for row in archives]
+    return '(' + ' UNION ALL '.join(selects) + ')'
+
+
+def archive_term(db, term, start_date, end_date):
+    """
+    Move attendance of a closed term into its own archive table
+    Returns: number of rows archived
+    """
+    table = archive_table_name(term)
+    if start_date > end_date:
+        raise ValueError('Term start date must not be after its end date')
+    if end_date >= date.today().isoformat():
+        raise ValueError('Only closed terms (ending before today) can be archived')
+
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        # Table names are lowercased, so 2024_ODD and 2024_odd are the same term
+        cursor.execute('SELECT term FROM attendance_terms WHERE term = ? OR table_name = ?', (term, table))
+        existing = cursor.fetchone()
+        if existing:
+            raise ValueError(f'Term {existing[0]} is already archived')
+        overlapping = list_terms(cursor, start_date, end_date)
+        if overlapping:
+            raise ValueError(f'Date range overlaps archived term {overlapping[0][0]}')
+
+        # One transaction: copy, delete from the hot table, register
+        # (explicit BEGIN so sqlite3 does not autocommit the DDL)
+        cursor.execute('BEGIN')
+        cursor.execute(f'CREATE TABLE {table} AS SELECT {ATTENDANCE_COLUMNS} FROM attendance WHERE 1 = 0')
+        cursor.execute(f'''
+            INSERT INTO {table} ({ATTENDANCE_COLUMNS})
+            SELECT {ATTENDANCE_COLUMNS} FROM attendance
+            WHERE date BETWEEN ? AND ?
+        ''', (start_date, end_date))
+        archived = cursor.rowcount
+        cursor.execute(f'CREATE INDEX idx_{table}_bus_date ON {table}(bus_number, date)')
+        cursor.execute(f'CREATE INDEX idx_{table}_student_date ON {table}(university_id, date)')
+        cursor.execute('DELETE FROM attendance WHERE date BETWEEN ? AND ?', (start_date, end_date))
+        cursor.execute('''
+            INSERT INTO attendance_terms (term, start_date, end_date, table_name, row_count)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (term, start_date, end_date, table, archived))
+        conn.commit()
+        return archived
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
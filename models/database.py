@@ -0,0 +1,270 @@
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from urllib.parse import urlparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Storage backends behind models.Database.
+# Application SQL is written in the SQLite dialect with '?' placeholders;
+# the PostgreSQL backend translates it on the fly so routes stay backend-agnostic.
+
+
+class SQLiteBackend:
+    dialect = 'sqlite'
+
+    def __init__(self, path):
+        self._anchor = None
+        if path in ('', ':memory:'):
+            # Every connection (and every Database instance) in the process must
+            # see the same in-memory database; it lives while one connection is open
+            self.path = 'file:memdb_attendance?mode=memory&cache=shared'
+            self.uri = True
+            self._anchor = self.connect()
+        else:
+            self.path = path
+            self.uri = False
+
+    def connect(self):
+        return sqlite3.connect(self.path, uri=self.uri)
+
+    def export_cursor(self, conn):
+        # sqlite3 cursors already step through results lazily
+        return conn.cursor()
+
+    def vacuum(self, mode='full'):
+        """mode: 'full' or 'incremental' (falls back to full without auto_vacuum=INCREMENTAL)"""
+        conn = self.connect()
+        try:
+            if mode == 'incremental':
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                    # The pragma frees one page per step; execute() steps it only
+                    # once (and fetchall() gets no rows to step through), while
+                    # executescript() runs it to completion
+                    conn.executescript('PRAGMA incremental_vacuum;')
+                    return 'incremental'
+            conn.execute('VACUUM')
+            return 'full'
+        finally:
+            conn.close()
+
+
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|\?|%")
+_TRANSLATIONS = [
+    (re.compile(r'INTEGER PRIMARY KEY AUTOINCREMENT', re.I), 'SERIAL PRIMARY KEY'),
+    (re.compile(r'\bBLOB\b', re.I), 'TEXT'),
+    (re.compile(r"DATE\('now'\)", re.I), 'CURRENT_DATE'),
+    # PostgreSQL REAL is float4: time.time() expiries would round to 128 s steps
+    (re.compile(r'\bREAL\b', re.I), 'DOUBLE PRECISION'),
+]
+_INSERT_OR_IGNORE = re.compile(r'^\s*INSERT\s+OR\s+IGNORE\s+INTO', re.I)
+
+
+def translate_sql(sql):
+    """Translate the SQLite-dialect SQL used by the app into PostgreSQL"""
+    for pattern, replacement in _TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    if _INSERT_OR_IGNORE.match(sql):
+        sql = _INSERT_OR_IGNORE.sub('INSERT INTO', sql).rstrip().rstrip(';') + ' ON CONFLICT DO NOTHING'
+
+    def replace(match):
+        token = match.group(0)
+        if token == '?':
+            return '%s'
+        # psycopg2 treats % as a format character even inside string literals
+        return token.replace('%', '%%')
+
+    return _SQL_TOKENS.sub(replace, sql)
+
+
+def _to_sqlite_value(value):
+    # Keep results shaped like SQLite's (ISO strings) so routes and
+    # templates behave the same on both backends
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class PostgresCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        if sql.strip().upper() == 'BEGIN':
+            # psycopg2 already opened a transaction
+            return self
+        self._cursor.execute(translate_sql(sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate_sql(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return tuple(_to_sqlite_value(v) for v in row) if row is not None else None
+
+    def fetchall(self):
+        return [tuple(_to_sqlite_value(v) for v in row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        return [tuple(_to_sqlite_value(v) for v in row) for row in rows]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield tuple(_to_sqlite_value(v) for v in row)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+    """Pooled psycopg2 connection with the sqlite3 Connection interface the app uses"""
+
+    def __init__(self, backend, raw):
+        self._backend = backend
+        self._raw = raw
+
+    def cursor(self, name=None):
+        return PostgresCursor(self._raw.cursor(name=name) if name else self._raw.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        # Return to the pool instead of closing; drop any uncommitted work
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._backend.release(raw)
+
+    def __del__(self):
+        # Safety net for code paths that raise before close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PostgresBackend:
+    dialect = 'postgresql'
+
+    def __init__(self, url, min_connections=1, max_connections=10, timeout=30):
+        """
+        max_connections: pool size per process; callers beyond it wait
+        timeout: seconds to wait for a free connection before failing
+        """
+        self.url = url
+        self.path = None
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._pool = None
+        self._slots = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pools must not be shared across fork(); gunicorn forks workers
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    try:
+                        from psycopg2.pool import ThreadedConnectionPool
+                    except ImportError:
+                        raise RuntimeError('PostgreSQL support needs psycopg2: pip install psycopg2-binary')
+                    self._pool = ThreadedConnectionPool(self.min_connections, self.max_connections, self.url)
+                    # getconn() raises PoolError when the pool is exhausted
+                    # instead of waiting, so callers queue on this first
+                    self._slots = threading.BoundedSemaphore(self.max_connections)
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _acquire(self):
+        pool = self._get_pool()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f'No free database connection after {self.timeout}s '
+                               f'(pool size {self.max_connections}, see DB_POOL_SIZE)')
+        try:
+            return pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _putconn(self, raw):
+        try:
+            self._get_pool().putconn(raw)
+        finally:
+            self._slots.release()
+
+    def connect(self):
+        return PostgresConnection(self, self._acquire())
+
+    def release(self, raw):
+        try:
+            raw.rollback()
+        finally:
+            self._putconn(raw)
+
+    def export_cursor(self, conn):
+        # Named (server-side) cursor so large exports stream in batches
+        cursor = conn.cursor(name=f'export_{uuid.uuid4().hex}')
+        cursor._cursor.itersize = 2000
+        return cursor
+
+    def vacuum(self, mode='full'):
+        raw = self._acquire()
+        try:
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute('VACUUM' if mode == 'incremental' else 'VACUUM FULL')
+            return mode
+        finally:
+            raw.autocommit = False
+            self._putconn(raw)
+
+
+# One PostgreSQL backend (and so one pool) per URL and process, shared by
+# every Database instance; gunicorn forks workers, hence the pid
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def create_backend(url, pool_size=10, pool_timeout=30):
+    """
+    Build the storage backend for a database URL (sqlite:///path or postgresql://...)
+    pool_size, pool_timeout: PostgreSQL connection pool per process (the first
+    call for a URL sets them)
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.split('+')[0]
+
+    if scheme == 'sqlite':
+        # sqlite:///relative.db, sqlite:////abs/path.db, sqlite:///:memory:
+        path = url.split(':///', 1)[1] if ':///' in url else ''
+        return SQLiteBackend(path)
+    if scheme in ('postgres', 'postgresql'):
+        # psycopg2 only understands the postgresql:// spelling
+        url = 'postgresql://' + url.split('://', 1)[1]
+        key = (url, os.getpid())
+        with _backends_lock:
+            if key not in _backends:
+                _backends[key] = PostgresBackend(url, max_connections=pool_size, timeout=pool_timeout)
+            return _backends[key]
+    raise ValueError(f'Unsupported database URL: {url}')
@@ -1,18 +1,23 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from models.models import Database
-from utils.face_encoder import FaceEncoder
-import cv2
-import numpy as np
+from models.archive import attendance_source
+from utils.vision import get_face_encoder, get_gallery_cache
+from utils.inference_pool import encode_image_async
+from utils.scan_guard import ScanCoalescer, create_rate_limiter
+import asyncio
 import base64
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import csv
 from io import StringIO
 import json
+import uuid
+from config import config
 
 attendance_bp = Blueprint('attendance', __name__)
 db = Database()
-face_encoder = FaceEncoder()
+scan_limiter = create_rate_limiter(config, db)
+scan_coalescer = ScanCoalescer(window=config.SCAN_COALESCE_WINDOW)
 
 @attendance_bp.route('/scan')
 def scan_attendance():
@@ -23,6 +28,110 @@ def scan_attendance():
                          bus_number=session.get('bus_number'),
                          incharge_name=session.get('incharge_name'))
 
+def _decode_image_data(image_data):
+    """Strip the data:image/jpeg;base64, prefix and decode the image bytes"""
+    if ',' in image_data:
+        image_data = image_data.split(',')[1]
+    return base64.b64decode(image_data)
+
+def _identify_student(image_bytes, bus_number):
+    """
+    Encode the scanned face and match it against the students of this bus
+    Returns: (matched_student or None, error message or None)
+    """
+    temp_path = f"static/uploads/temp_attendance_{uuid.uuid4().hex}.jpg"
+    os.makedirs("static/uploads", exist_ok=True)
+    
+    with open(temp_path, 'wb') as f:
+        f.write(image_bytes)
+    
+    print(f"📸 Saved temporary image: {temp_path}")
+    
+    try:
+        scanned_encoding, quality_msg = get_face_encoder().encode_face_checked(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    if scanned_encoding is None:
+        return None, quality_msg
+    
+    return _match_encoding(scanned_encoding, bus_number)
+
+def _match_encoding(scanned_encoding, bus_number):
+    """
+    Match an encoded face against the students of this bus
+    Returns: (matched_student or None, error message or None)
+    """
+    # Vectorized match against the cached gallery of this bus
+    gallery = get_gallery_cache(db).get(bus_number)
+    
+    if not len(gallery):
+        return None, f'No students with face data found in bus {bus_number}'
+    
+    print(f"🔍 Checking {len(gallery)} students in bus {bus_number}")
+    
+    index, distance = gallery.best_match(scanned_encoding)
+    name = gallery.names[index]
+    print(f"🎯 Closest: {name} (distance {distance:.3f})")
+    
+    if gallery.is_match(index, distance):
+        print(f"✅ MATCH FOUND: {name}")
+        return {'university_id': gallery.university_ids[index], 'name': name}, None
+    
+    return None, f'❌ No matching student found. Checked {len(gallery)} students. Closest: {name} ({distance:.2f})'
+
+def _mark_attendance(student, bus_number, captured_at=None):
+    """
+    Record attendance for a matched student
+    captured_at: naive UTC datetime of the capture (defaults to now)
+    Returns: True if attendance was already marked for that day
+    """
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        
+        # The unique (university_id, bus_number, date) index makes a second mark
+        # of the same day a no-op, so concurrent scans need no check-then-insert
+        if captured_at is None:
+            cursor.execute('''
+                INSERT OR IGNORE INTO attendance (university_id, bus_number, date)
+                VALUES (?, ?, DATE('now'))
+            ''', (student['university_id'], bus_number))
+        else:
+            cursor.execute('''
+                INSERT OR IGNORE INTO attendance (university_id, bus_number, date, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', (student['university_id'], bus_number,
+                  captured_at.strftime('%Y-%m-%d'), captured_at.strftime('%Y-%m-%d %H:%M:%S')))
+        
+        already_marked = cursor.rowcount == 0
+        conn.commit()
+    finally:
+        conn.close()
+    return already_marked
+
+def _check_rate(incharge_id):
+    """Returns a 429 response when this incharge is scanning too fast, else None"""
+    allowed, retry_after = scan_limiter.allow(incharge_id)
+    if allowed:
+        return None
+    return jsonify({'success': False,
+                    'message': 'Too many scans - slow down and hold the camera steady.',
+                    'retry_after': round(retry_after, 1)}), 429
+
+def _scan_result(student, already_marked):
+    if already_marked:
+        message = f'✅ Attendance already marked for {student["name"]}'
+    else:
+        message = f'✅ Attendance marked for {student["name"]}'
+    return {
+        'success': True,
+        'message': message,
+        'student': student,
+        'already_marked': already_marked
+    }
+
 @attendance_bp.route('/process-attendance', methods=['POST'])
 def process_attendance():
     if 'incharge_id' not in session or session.get('role') != 'incharge':
@@ -36,121 +145,176 @@ def process_attendance():
         if not image_data:
             return jsonify({'success': False, 'message': 'No image data received'})
         
-        # Convert base64 image to file
-        image_data = image_data.split(',')[1]  # Remove data:image/jpeg;base64,
-        image_bytes = base64.b64decode(image_data)
+        limited = _check_rate(session.get('incharge_id'))
+        if limited:
+            return limited
         
-        temp_path = f"static/uploads/temp_attendance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        os.makedirs("static/uploads", exist_ok=True)
+        # Resubmissions of the same frame share one identification
+        image_bytes = _decode_image_data(image_data)
+        matched_student, error_msg = scan_coalescer.run(
+            scan_coalescer.image_key(bus_number, image_bytes),
+            lambda: _identify_student(image_bytes, bus_number))
         
-        with open(temp_path, 'wb') as f:
-            f.write(image_bytes)
+        if not matched_student:
+            return jsonify({'success': False, 'message': error_msg})
         
-        print(f"📸 Saved temporary image: {temp_path}")
+        already_marked = _mark_attendance(matched_student, bus_number)
+        return jsonify(_scan_result(matched_student, already_marked))
         
-        scanned_encoding = face_encoder.encode_face(temp_path)
+    except Exception as e:
+        print(f"❌ Attendance error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Attendance processing error: {str(e)}'})
 
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+@attendance_bp.route('/process-attendance-async', methods=['POST'])
+async def process_attendance_async():
+    """
+    Same contract as /process-attendance, but awaits the inference pool and
+    runs DB calls in threads. Serve with threaded workers (for example
+    gunicorn -k gthread --threads 100) so one worker keeps many scans in
+    flight while encoding is bounded by INFERENCE_POOL_SIZE processes.
+    """
+    if 'incharge_id' not in session or session.get('role') != 'incharge':
+        return jsonify({'success': False, 'message': 'Unauthorized access'})
+    
+    try:
+        data = request.json
+        image_data = data.get('image')
+        bus_number = session.get('bus_number')
+        
+        if not image_data:
+            return jsonify({'success': False, 'message': 'No image data received'})
         
-        if scanned_encoding is None:
-            return jsonify({'success': False, 'message': 'No face found in the scanned image.'})
+        limited = await asyncio.to_thread(_check_rate, session.get('incharge_id'))
+        if limited:
+            return limited
         
-        # Get all students from this bus
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT university_id, name, face_encoding 
-            FROM students 
-            WHERE bus_number = ? AND face_encoding IS NOT NULL
-        ''', (bus_number,))
+        image_bytes = _decode_image_data(image_data)
         
-        students = cursor.fetchall()
-        conn.close()
+        async def identify():
+            scanned_encoding, quality_msg = await encode_image_async(image_bytes)
+            if scanned_encoding is None:
+                return None, quality_msg
+            return await asyncio.to_thread(_match_encoding, scanned_encoding, bus_number)
         
-        if not students:
-            return jsonify({'success': False, 'message': f'No students with face data found in bus {bus_number}'})
+        matched_student, error_msg = await scan_coalescer.run_async(
+            scan_coalescer.image_key(bus_number, image_bytes), identify)
         
-        print(f"🔍 Checking {len(students)} students in bus {bus_number}")
+        if not matched_student:
+            return jsonify({'success': False, 'message': error_msg})
         
-        matched_student = None
-        match_details = []
+        already_marked = await asyncio.to_thread(_mark_attendance, matched_student, bus_number)
+        return jsonify(_scan_result(matched_student, already_marked))
         
-        for university_id, name, stored_encoding in students:
-            if not stored_encoding:
-                match_details.append(f"{name}: No face encoding")
-                continue
+    except Exception as e:
+        print(f"❌ Attendance error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Attendance processing error: {str(e)}'})
 
-            # Change here! Load DB encoding back to numpy array using json.loads
-            try:
-                stored_encoding_np = np.array(json.loads(stored_encoding))
-            except Exception as e:
-                match_details.append(f"{name}: Failed to decode encoding")
-                continue
+def _parse_capture_time(value):
+    """
+    Parse an ISO-8601 capture timestamp from the scan page into naive UTC
+    Returns: (datetime or None, error message or None)
+    """
+    if not value:
+        return None, 'Missing capture time'
+    try:
+        captured_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None, 'Invalid capture time'
+    
+    if captured_at.tzinfo is not None:
+        captured_at = captured_at.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    now = datetime.utcnow()
+    if captured_at > now:
+        # Clock skew on the device; never record attendance in the future
+        captured_at = now
+    if now - captured_at > timedelta(days=config.OFFLINE_SYNC_MAX_AGE_DAYS):
+        return None, f'Capture is older than {config.OFFLINE_SYNC_MAX_AGE_DAYS} days and was not synced'
+    return captured_at, None
+
+def _sync_one_scan(scan, bus_number):
+    """
+    Process one queued capture idempotently by its client-generated id
+    Returns: result dict; 'retry' tells the client whether to keep it queued
+    """
+    client_id = str(scan.get('client_id') or '')
+    if not client_id or len(client_id) > 64:
+        return {'client_id': client_id, 'success': False, 'retry': False,
+                'message': 'Invalid client id'}
+    
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT result FROM scan_submissions WHERE client_id = ?", (client_id,))
+        previous = cursor.fetchone()
+    finally:
+        conn.close()
+    
+    if previous:
+        result = json.loads(previous[0])
+        result['duplicate'] = True
+        return result
+    
+    captured_at, error_msg = _parse_capture_time(scan.get('captured_at'))
+    if error_msg:
+        result = {'success': False, 'message': error_msg}
+    elif not scan.get('image'):
+        result = {'success': False, 'message': 'No image data received'}
+    else:
+        try:
+            image_bytes = _decode_image_data(scan['image'])
+            matched_student, error_msg = _identify_student(image_bytes, bus_number)
+            if matched_student:
+                result = _scan_result(matched_student, _mark_attendance(matched_student, bus_number, captured_at))
+            else:
+                result = {'success': False, 'message': error_msg}
+        except Exception as e:
+            # Not recorded, so the client retries on the next sync
+            print(f"❌ Offline sync error for {client_id}: {str(e)}")
+            return {'client_id': client_id, 'success': False, 'retry': True,
+                    'message': f'Attendance processing error: {str(e)}'}
+    
+    result.update({'client_id': client_id, 'retry': False})
+    
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO scan_submissions (client_id, bus_number, captured_at, result)
+            VALUES (?, ?, ?, ?)
+        ''', (client_id, bus_number,
+              captured_at.strftime('%Y-%m-%d %H:%M:%S') if captured_at else None,
+              json.dumps(result)))
+        conn.commit()
+    finally:
+        conn.close()
+    return result
 
-            is_match = face_encoder.compare_faces(stored_encoding_np, scanned_encoding, tolerance=0.6)
-            
-            result_str = "Match" if is_match else "No match"
-            match_details.append(f"{name}: {result_str}")
-            print(f"🎯 Checking {name}: {result_str}")
-            
-            if is_match:
-                matched_student = {
-                    'university_id': university_id,
-                    'name': name
-                }
-                print(f"✅ MATCH FOUND: {name}")
-                break
+@attendance_bp.route('/sync-scans', methods=['POST'])
+def sync_scans():
+    """Accept a batch of captures queued offline by the scan page"""
+    if 'incharge_id' not in session or session.get('role') != 'incharge':
+        return jsonify({'success': False, 'message': 'Unauthorized access'})
+    
+    try:
+        data = request.json or {}
+        scans = data.get('scans') or []
+        bus_number = session.get('bus_number')
         
-        print(f"📊 Match results: {match_details}")
+        if not isinstance(scans, list):
+            return jsonify({'success': False, 'message': 'scans must be a list'})
+        if len(scans) > config.OFFLINE_SYNC_MAX_BATCH:
+            return jsonify({'success': False,
+                            'message': f'Batch too large (max {config.OFFLINE_SYNC_MAX_BATCH} scans)'})
         
-        if matched_student:
-            # Mark attendance
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            
-            # Check if already marked today
-            cursor.execute('''
-                SELECT * FROM attendance 
-                WHERE university_id = ? AND date = DATE('now') AND bus_number = ?
-            ''', (matched_student['university_id'], bus_number))
-            
-            if cursor.fetchone():
-                conn.close()
-                return jsonify({
-                    'success': True,
-                    'message': f'✅ Attendance already marked for {matched_student["name"]}',
-                    'student': matched_student,
-                    'already_marked': True
-                })
-            
-            # Insert attendance
-            cursor.execute('''
-                INSERT INTO attendance (university_id, bus_number, date)
-                VALUES (?, ?, DATE('now'))
-            ''', (matched_student['university_id'], bus_number))
-            
-            conn.commit()
-            conn.close()
-            
-            return jsonify({
-                'success': True,
-                'message': f'✅ Attendance marked for {matched_student["name"]}',
-                'student': matched_student,
-                'already_marked': False
-            })
-        else:
-            error_msg = f'❌ No matching student found. Checked {len(students)} students.'
-            if match_details:
-                error_msg += f' Details: {", ".join(match_details[:3])}'
-            return jsonify({
-                'success': False,
-                'message': error_msg
-            })
+        results = [_sync_one_scan(scan, bus_number) for scan in scans]
+        print(f"📶 Synced {len(results)} offline scans for bus {bus_number}")
+        
+        return jsonify({'success': True, 'results': results})
         
     except Exception as e:
-        print(f"❌ Attendance error: {str(e)}")
-        return jsonify({'success': False, 'message': f'Attendance processing error: {str(e)}'})
+        print(f"❌ Offline sync error: {str(e)}")
+        return jsonify({'success': False, 'message': f'Offline sync error: {str(e)}'})
 
 # All other attendance routes stay the same!
 
@@ -214,30 +378,34 @@ def download_attendance():
     date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
     
     conn = db.get_connection()
-    cursor = conn.cursor()
+    try:
+        cursor = conn.cursor()
     
-    # Get attendance data
-    cursor.execute('''
-        SELECT s.university_id, s.name, a.timestamp 
-        FROM attendance a
-        JOIN students s ON a.university_id = s.university_id
-        WHERE a.date = ? AND a.bus_number = ?
-        ORDER BY s.university_id
-    ''', (date, bus_number))
+        # Get attendance data (from the archives if the date is in a closed term)
+        source = attendance_source(cursor, date, date)
     
-    attendance_data = cursor.fetchall()
-    conn.close()
+        # Stream rows into the CSV (server-side cursor on PostgreSQL)
+        export_cursor = db.export_cursor(conn)
+        export_cursor.execute(f'''
+            SELECT s.university_id, s.name, a.timestamp 
+            FROM {source} a
+            JOIN students s ON a.university_id = s.university_id
+            WHERE a.date = ? AND a.bus_number = ?
+            ORDER BY s.university_id
+        ''', (date, bus_number))
     
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
+        # Create CSV
+        output = StringIO()
+        writer = csv.writer(output)
     
-    # Write header
-    writer.writerow(['University ID', 'Name', 'Timestamp', 'Status'])
+        # Write header
+        writer.writerow(['University ID', 'Name', 'Timestamp', 'Status'])
     
-    # Write data
-    for row in attendance_data:
-        writer.writerow([row[0], row[1], row[2], 'Present'])
+        # Write data
+        for row in export_cursor:
+            writer.writerow([row[0], row[1], row[2], 'Present'])
+    finally:
+        conn.close()
     
     # Prepare response
     output.seek(0)
@@ -248,6 +416,64 @@ def download_attendance():
         'filename': f'attendance_bus_{bus_number}_{date}.csv'
     })
 
+@attendance_bp.route('/attendance-history')
+def attendance_history():
+    if 'incharge_id' not in session or session.get('role') != 'incharge':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    bus_number = session.get('bus_number')
+    today = datetime.now().strftime('%Y-%m-%d')
+    date_from = request.args.get('from', today)
+    date_to = request.args.get('to', date_from)
+    
+    try:
+        datetime.strptime(date_from, '%Y-%m-%d')
+        datetime.strptime(date_to, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'})
+    
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+    
+        source = attendance_source(cursor, date_from, date_to)
+        cursor.execute(f'''
+            SELECT a.date, s.university_id, s.name, a.timestamp
+            FROM {source} a
+            JOIN students s ON a.university_id = s.university_id
+            WHERE a.date BETWEEN ? AND ? AND a.bus_number = ?
+            ORDER BY a.date, s.university_id
+        ''', (date_from, date_to, bus_number))
+    
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'success': True,
+        'from': date_from,
+        'to': date_to,
+        'attendance': [
+            {
+                'date': row[0],
+                'university_id': row[1],
+                'name': row[2],
+                'time': row[3]
+            } for row in rows
+        ]
+    })
+
+@attendance_bp.route('/bus-analytics')
+def bus_analytics():
+    if 'incharge_id' not in session or session.get('role') != 'incharge':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    try:
+        from utils.attendance_analytics import bus_analytics as compute_bus_analytics
+        return jsonify({'success': True, **compute_bus_analytics(db, config, session.get('bus_number'))})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error computing analytics: {str(e)}'})
+
 @attendance_bp.route('/change-bus-password', methods=['POST'])
 def change_bus_password():
     if 'incharge_id' not in session or session.get('role') != 'incharge':
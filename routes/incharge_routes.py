@@ -1,11 +1,13 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from models.models import Database
 from utils.otp_generator import OTPHandler
+from utils.otp_store import create_otp_store
+from config import config
 import hashlib
 
 incharge_bp = Blueprint('incharge', __name__)
 db = Database()
-otp_handler = OTPHandler()
+otp_handler = OTPHandler(store=create_otp_store(config, db), ttl=config.OTP_TTL_SECONDS)
 
 @incharge_bp.route('/signup', methods=['GET', 'POST'])
 def signup():
@@ -83,16 +85,20 @@ def verify_otp():
         
         # Complete registration
         conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO bus_incharges (name, email, phone, bus_number, bus_password)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (signup_data['name'], signup_data['email'], signup_data['phone'], 
-              signup_data['bus_number'], bus_password))
-        
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            
+            # Students of this bus reference it
+            cursor.execute('INSERT OR IGNORE INTO buses (bus_number) VALUES (?)', (signup_data['bus_number'],))
+            cursor.execute('''
+                INSERT INTO bus_incharges (name, email, phone, bus_number, bus_password)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (signup_data['name'], signup_data['email'], signup_data['phone'], 
+                  signup_data['bus_number'], bus_password))
+            
+            conn.commit()
+        finally:
+            conn.close()
         
         # Clear session
         session.pop('signup_data', None)
@@ -186,6 +192,8 @@ def verify_login():
         conn.close()
         
         if incharge:
+            # New session id for the authenticated session (no fixation)
+            session.regenerate()
             session['incharge_id'] = incharge[0]
             session['incharge_name'] = incharge[1]
             session['bus_number'] = incharge[2]
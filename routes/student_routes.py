@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 import hashlib
 from models.models import Database
-from utils.face_encoder import FaceEncoder
+from utils.vision import get_face_encoder, get_gallery_cache
+from config import config
 import os
 import base64
 from datetime import datetime
@@ -39,11 +40,11 @@ def validate_roll_number(roll_no):
 
 student_bp = Blueprint('student', __name__)
 db = Database()
-face_encoder = FaceEncoder()
 
 @student_bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
+        conn = None
         try:
             data = request.form
             university_id = data.get('university_id')
@@ -100,18 +101,30 @@ def signup():
                     f.write(image_bytes)
                 
                 # Extract face encoding using dlib
-                face_encoding = face_encoder.encode_face(temp_image_path)
+                face_encoding, quality_msg = get_face_encoder().encode_face_checked(temp_image_path)
                 
                 # Remove temp image
                 if os.path.exists(temp_image_path):
                     os.remove(temp_image_path)
                 
                 if face_encoding is None:
-                    return jsonify({'success': False, 'message': 'No face found in the captured image. Please try again with a clearer face photo.'})
+                    return jsonify({'success': False, 'message': f'{quality_msg} Please try again with a clearer face photo.'})
                 
             except Exception as e:
                 return jsonify({'success': False, 'message': f'Face processing error: {str(e)}'})
             
+            # Same face already enrolled under another university ID?
+            from utils.duplicate_faces import find_enrolled_duplicate
+            cursor.execute("SELECT DISTINCT bus_number FROM students WHERE face_encoding IS NOT NULL")
+            enrolled_buses = [row[0] for row in cursor.fetchall()]
+            duplicate = find_enrolled_duplicate(get_gallery_cache(db), enrolled_buses, face_encoding,
+                                                config.DUPLICATE_FACE_THRESHOLD)
+            if duplicate:
+                conn.close()
+                logger.warning(f"Signup of {university_id} rejected: face matches {duplicate[0]} "
+                               f"(bus {duplicate[2]}, distance {duplicate[3]:.3f})")
+                return jsonify({'success': False, 'message': 'This face is already registered under another University ID. Please contact your bus incharge.'})
+            
             # Hash password
             hashed_password = hashlib.sha256(password.encode()).hexdigest()
             
@@ -134,6 +147,10 @@ def signup():
             
         except Exception as e:
             return jsonify({'success': False, 'message': f'Registration error: {str(e)}'})
+        finally:
+            # close() is idempotent; covers the early returns and errors
+            if conn is not None:
+                conn.close()
     
     return render_template('student/signup.html')
 
@@ -157,6 +174,8 @@ def login():
         conn.close()
         
         if student:
+            # New session id for the authenticated session (no fixation)
+            session.regenerate()
             session['student_id'] = student[0]
             session['student_name'] = student[1]
             session['bus_number'] = student[2]
@@ -205,3 +224,18 @@ def attendance_status():
             
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error checking attendance: {str(e)}'})
+
+@student_bp.route('/analytics')
+def analytics():
+    if 'student_id' not in session or session.get('role') != 'student':
+        return jsonify({'success': False, 'message': 'Unauthorized'})
+    
+    try:
+        from utils.attendance_analytics import student_analytics
+        result = student_analytics(db, config, session.get('student_id'), session.get('bus_number'))
+        if result is None:
+            return jsonify({'success': False, 'message': 'Student not found on this bus'})
+        return jsonify({'success': True, **result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error computing analytics: {str(e)}'})
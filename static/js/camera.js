@@ -48,16 +48,30 @@ class CameraHandler {
         return success;
     }
 
-    captureFrame() {
+    captureFrame(maxWidth = null, quality = 0.92) {
+        return this.encodeFrame(this.grabFrame(), maxWidth, quality);
+    }
+
+    // Freeze the current video frame so it can be encoded more than once
+    grabFrame() {
         const video = document.getElementById('cameraFeed');
         const canvas = document.createElement('canvas');
-        const context = canvas.getContext('2d');
-
         canvas.width = video.videoWidth;
         canvas.height = video.videoHeight;
-        context.drawImage(video, 0, 0, canvas.width, canvas.height);
+        canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+        return canvas;
+    }
 
-        return canvas.toDataURL('image/jpeg');
+    encodeFrame(frame, maxWidth = null, quality = 0.92) {
+        // Optionally downscale (used for captures stored in the offline queue)
+        if (!maxWidth || frame.width <= maxWidth) {
+            return frame.toDataURL('image/jpeg', quality);
+        }
+        const canvas = document.createElement('canvas');
+        canvas.width = maxWidth;
+        canvas.height = Math.round(frame.height * maxWidth / frame.width);
+        canvas.getContext('2d').drawImage(frame, 0, 0, canvas.width, canvas.height);
+        return canvas.toDataURL('image/jpeg', quality);
     }
 
     stopCamera() {
@@ -97,9 +111,22 @@ async function processAttendance() {
     captureBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Scanning...';
     captureBtn.disabled = true;
 
+    // Capture once: a failed request may take long, and by then someone else
+    // can be in front of the camera
+    let frame = null;
+    let capturedAt = null;
+
     try {
-        // Capture frame
-        const imageData = camera.captureFrame();
+        frame = camera.grabFrame();
+        capturedAt = new Date().toISOString();
+
+        // No connectivity on the route: queue the capture for later sync
+        if (!navigator.onLine && typeof scanQueue !== 'undefined') {
+            await queueOfflineScan(camera.encodeFrame(frame, 640, 0.85), capturedAt);
+            return;
+        }
+
+        const imageData = camera.encodeFrame(frame);
         
         // Send to server for face recognition
         const response = await fetch('/attendance/process-attendance', {
@@ -121,7 +148,12 @@ async function processAttendance() {
             showNotification(result.message, 'error');
         }
     } catch (error) {
-        showNotification('Network error: ' + error.message, 'error');
+        if (error instanceof TypeError && frame && typeof scanQueue !== 'undefined') {
+            // fetch rejects with TypeError when the request never reached the server
+            await queueOfflineScan(camera.encodeFrame(frame, 640, 0.85), capturedAt);
+        } else {
+            showNotification('Network error: ' + error.message, 'error');
+        }
     } finally {
         captureBtn.innerHTML = originalText;
         captureBtn.disabled = false;
@@ -129,6 +161,15 @@ async function processAttendance() {
     }
 }
 
+async function queueOfflineScan(imageData, capturedAt) {
+    try {
+        await scanQueue.add(imageData, capturedAt);
+        showNotification('📴 No connection - scan saved and will sync automatically', 'warning');
+    } catch (error) {
+        showNotification('Could not save offline scan: ' + error.message, 'error');
+    }
+}
+
 function showStudentInfo(student) {
     const infoDiv = document.getElementById('studentInfo');
     if (infoDiv) {
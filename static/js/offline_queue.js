@@ -0,0 +1,157 @@
+// Offline scan queue: captures taken without connectivity are kept in
+// IndexedDB and synced in batches to /attendance/sync-scans when the
+// network returns. Each capture carries a client-generated id so a batch
+// that is retried after a dropped response is not marked twice.
+class ScanQueue {
+    constructor() {
+        this.dbName = 'smart-bus-scans';
+        this.storeName = 'pending';
+        this.batchSize = 5;
+        this.db = null;
+        this.isSyncing = false;
+    }
+
+    open() {
+        if (this.db) return Promise.resolve(this.db);
+
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(this.dbName, 1);
+            request.onupgradeneeded = () => {
+                const store = request.result.createObjectStore(this.storeName, { keyPath: 'client_id' });
+                store.createIndex('captured_at', 'captured_at');
+            };
+            request.onsuccess = () => {
+                this.db = request.result;
+                resolve(this.db);
+            };
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async transaction(mode, work) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(this.storeName, mode);
+            const result = work(tx.objectStore(this.storeName));
+            tx.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    newClientId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+    }
+
+    // capturedAt: ISO time the frame was taken (defaults to now)
+    async add(image, capturedAt = null) {
+        const scan = {
+            client_id: this.newClientId(),
+            image: image,
+            captured_at: capturedAt || new Date().toISOString()
+        };
+        await this.transaction('readwrite', store => store.put(scan));
+        updateQueueStatus();
+        return scan;
+    }
+
+    async count() {
+        return this.transaction('readonly', store => store.count());
+    }
+
+    async oldest(limit) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const scans = [];
+            const tx = db.transaction(this.storeName, 'readonly');
+            const cursorRequest = tx.objectStore(this.storeName).index('captured_at').openCursor();
+            cursorRequest.onsuccess = () => {
+                const cursor = cursorRequest.result;
+                if (cursor && scans.length < limit) {
+                    scans.push(cursor.value);
+                    cursor.continue();
+                }
+            };
+            tx.oncomplete = () => resolve(scans);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    async remove(clientIds) {
+        await this.transaction('readwrite', store => {
+            clientIds.forEach(id => store.delete(id));
+        });
+    }
+
+    async sync() {
+        if (this.isSyncing || !navigator.onLine) return;
+        this.isSyncing = true;
+
+        try {
+            while (true) {
+                const batch = await this.oldest(this.batchSize);
+                if (batch.length === 0) break;
+
+                const response = await fetch('/attendance/sync-scans', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ scans: batch })
+                });
+                const result = await response.json();
+                if (!result.success) {
+                    showNotification(result.message, 'error');
+                    break;
+                }
+
+                const done = result.results.filter(r => !r.retry).map(r => r.client_id);
+                await this.remove(done);
+
+                const marked = result.results.filter(r => r.success && !r.already_marked && !r.duplicate);
+                if (marked.length > 0) {
+                    showNotification(`📶 Synced ${marked.length} offline scan(s): ` +
+                        marked.map(r => r.student.name).join(', '), 'success');
+                }
+                result.results.filter(r => !r.success && !r.retry).forEach(r => {
+                    showNotification(`Offline scan not marked: ${r.message}`, 'warning');
+                });
+
+                // Stop if the server asked us to retry everything in this batch
+                if (done.length === 0) break;
+            }
+        } catch (error) {
+            console.error('Offline sync error:', error);
+        } finally {
+            this.isSyncing = false;
+            updateQueueStatus();
+        }
+    }
+}
+
+const scanQueue = new ScanQueue();
+
+async function updateQueueStatus() {
+    const statusDiv = document.getElementById('offlineQueueStatus');
+    if (!statusDiv) return;
+
+    const pending = await scanQueue.count();
+    if (pending > 0) {
+        statusDiv.style.display = 'block';
+        statusDiv.innerHTML = `<i class="fas fa-cloud-upload-alt"></i> ${pending} scan(s) waiting to sync` +
+            (navigator.onLine ? '' : ' (offline)');
+    } else {
+        statusDiv.style.display = 'none';
+    }
+}
+
+window.addEventListener('online', () => scanQueue.sync());
+window.addEventListener('offline', updateQueueStatus);
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (!('indexedDB' in window)) return;
+    updateQueueStatus();
+    scanQueue.sync();
+    // 'online' is not reliable on every mobile browser, so also poll
+    setInterval(() => scanQueue.sync(), 30000);
+});
@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Run from anywhere: make the app packages (models, utils, ...) importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from models.database import create_backend
+from models.models import Database
+
+# A scratch PostgreSQL database, e.g. postgresql://postgres@localhost/attendance_test;
+# tests using the `db` fixture also run against it, dropping and recreating
+# its public schema each time
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+def _reset_postgres(url):
+    conn = create_backend(url).connect()
+    try:
+        conn.execute('DROP SCHEMA public CASCADE')
+        conn.execute('CREATE SCHEMA public')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def db(request, tmp_path):
+    if request.param == 'sqlite':
+        return Database(url=f'sqlite:///{tmp_path / "test.db"}')
+    if not TEST_DATABASE_URL:
+        pytest.skip('set TEST_DATABASE_URL to run against PostgreSQL')
+    _reset_postgres(TEST_DATABASE_URL)
+    return Database(url=TEST_DATABASE_URL)
@@ -0,0 +1,60 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from models.models import Database
+
+pytest.importorskip('pandas')
+from utils.attendance_analytics import bus_analytics, student_analytics
+
+CONFIG = SimpleNamespace(TERM_START_DATE='2024-01-01')
+TODAY = date(2024, 1, 5)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(url=f'sqlite:///{tmp_path / "test.db"}')
+    conn = db.get_connection()
+    for uid in ('a', 'b'):
+        conn.execute('''
+            INSERT INTO students (university_id, password, name, bus_number, bus_password, face_encoding, created_at)
+            VALUES (?, 'x', ?, 1, 'pw', '[]', '2024-01-01 00:00:00')
+        ''', (uid, uid.upper()))
+    for uid, day in (('a', '01'), ('a', '02'), ('a', '03'), ('b', '01'), ('b', '03')):
+        _mark(conn, uid, f'2024-01-{day}')
+    conn.commit()
+    conn.close()
+    return db
+
+def _mark(conn, uid, day):
+    conn.execute('INSERT INTO attendance (university_id, bus_number, date) VALUES (?, 1, ?)', (uid, day))
+
+
+def test_student_percentage_and_streaks(db):
+    result = student_analytics(db, CONFIG, 'b', 1, today=TODAY)
+    assert (result['present_days'], result['service_days'], result['percentage']) == (2, 3, 66.7)
+    assert (result['current_streak'], result['longest_streak']) == (1, 1)
+
+def test_back_dated_mark_is_picked_up(db):
+    assert student_analytics(db, CONFIG, 'b', 1, today=TODAY)['present_days'] == 2
+
+    # Offline sync writing yesterday's capture after the history was cached
+    conn = db.get_connection()
+    _mark(conn, 'b', '2024-01-02')
+    conn.commit()
+    conn.close()
+
+    result = student_analytics(db, CONFIG, 'b', 1, today=TODAY)
+    assert result['present_days'] == 3
+    assert result['longest_streak'] == 3
+
+def test_deleted_history_is_picked_up(db):
+    assert bus_analytics(db, CONFIG, 1, today=TODAY)['service_days'] == 3
+
+    conn = db.get_connection()
+    conn.execute("DELETE FROM attendance WHERE date = '2024-01-02'")
+    conn.commit()
+    conn.close()
+
+    assert bus_analytics(db, CONFIG, 1, today=TODAY)['service_days'] == 2
@@ -0,0 +1,200 @@
+import time
+
+import pytest
+
+from models import database
+from models.database import SQLiteBackend, PostgresBackend, create_backend, translate_sql
+from models.models import Database
+
+
+# ===== translate_sql =====
+
+def test_translate_placeholders():
+    assert translate_sql('SELECT * FROM students WHERE university_id = ? AND bus_number = ?') == \
+        'SELECT * FROM students WHERE university_id = %s AND bus_number = %s'
+
+def test_translate_escapes_percent_everywhere():
+    # psycopg2 formats % even inside literals
+    assert translate_sql("SELECT '100%' WHERE name LIKE ?") == "SELECT '100%%' WHERE name LIKE %s"
+
+def test_translate_question_mark_inside_literal_is_kept():
+    assert translate_sql("SELECT 'why?' FROM t WHERE a = ?") == "SELECT 'why?' FROM t WHERE a = %s"
+
+def test_translate_schema_types():
+    sql = translate_sql('CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, face BLOB NOT NULL)')
+    assert sql == 'CREATE TABLE t (id SERIAL PRIMARY KEY, face TEXT NOT NULL)'
+
+def test_translate_real_is_double_precision():
+    assert translate_sql('CREATE TABLE t (expires_at REAL NOT NULL)') == \
+        'CREATE TABLE t (expires_at DOUBLE PRECISION NOT NULL)'
+
+def test_translate_date_now():
+    assert translate_sql("SELECT * FROM attendance WHERE date = DATE('now')") == \
+        'SELECT * FROM attendance WHERE date = CURRENT_DATE'
+
+def test_translate_insert_or_ignore():
+    assert translate_sql('INSERT OR IGNORE INTO buses (bus_number) VALUES (?);') == \
+        'INSERT INTO buses (bus_number) VALUES (%s) ON CONFLICT DO NOTHING'
+    assert translate_sql('INSERT OR IGNORE INTO buses (bus_number) SELECT bus_number FROM bus_incharges') == \
+        'INSERT INTO buses (bus_number) SELECT bus_number FROM bus_incharges ON CONFLICT DO NOTHING'
+
+
+# ===== create_backend =====
+
+def test_create_backend_sqlite_relative_path():
+    backend = create_backend('sqlite:///database.db')
+    assert isinstance(backend, SQLiteBackend)
+    assert backend.path == 'database.db'
+
+def test_create_backend_sqlite_absolute_path(tmp_path):
+    path = str(tmp_path / 'attendance.db')
+    backend = create_backend(f'sqlite:///{path}')
+    assert backend.path == path
+
+def test_create_backend_sqlite_memory_is_shared():
+    backend = create_backend('sqlite:///:memory:')
+    assert backend.uri and 'mode=memory' in backend.path
+
+@pytest.mark.parametrize('url', [
+    'postgres://user:pw@localhost:5432/attendance',
+    'postgresql://user:pw@localhost:5432/attendance',
+    'postgresql+psycopg2://user:pw@localhost:5432/attendance',
+])
+def test_create_backend_postgres_urls(url, monkeypatch):
+    monkeypatch.setattr(database, '_backends', {})
+    # Building the backend does not connect (the pool is created lazily)
+    backend = create_backend(url, pool_size=25, pool_timeout=5)
+    assert isinstance(backend, PostgresBackend)
+    assert backend.url == 'postgresql://user:pw@localhost:5432/attendance'
+    assert backend.max_connections == 25
+    assert backend.timeout == 5
+
+def test_create_backend_shares_one_postgres_pool_per_url(monkeypatch):
+    monkeypatch.setattr(database, '_backends', {})
+    first = create_backend('postgresql://user:pw@localhost/attendance')
+    assert create_backend('postgres://user:pw@localhost/attendance') is first
+    assert create_backend('postgresql://user:pw@localhost/other') is not first
+
+def test_create_backend_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        create_backend('mysql://localhost/attendance')
+
+
+# ===== Database (SQLite, and PostgreSQL when TEST_DATABASE_URL is set) =====
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    return Database(url=f'sqlite:///{tmp_path / "test.db"}')
+
+def _tables(db):
+    if db.dialect == 'postgresql':
+        sql = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
+    else:
+        sql = "SELECT name FROM sqlite_master WHERE type = 'table'"
+    conn = db.get_connection()
+    try:
+        rows = conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+    return {row[0] for row in rows}
+
+SCHEMA_TABLES = {'students', 'bus_incharges', 'buses', 'attendance', 'scan_submissions', 'attendance_terms',
+                 'face_thresholds', 'app_meta', 'student_changes'}
+
+def test_schema_is_created(db):
+    assert SCHEMA_TABLES <= _tables(db)
+
+def test_memory_database_creates_schema():
+    db = Database(url='sqlite:///:memory:')
+    assert db.dialect == 'sqlite'
+    assert SCHEMA_TABLES <= _tables(db)
+
+def test_memory_database_is_shared_between_instances():
+    first = Database(url='sqlite:///:memory:')
+    conn = first.get_connection()
+    conn.execute("INSERT OR IGNORE INTO buses (bus_number) VALUES (777)")
+    conn.commit()
+    conn.close()
+
+    conn = Database(url='sqlite:///:memory:').get_connection()
+    assert conn.execute('SELECT 1 FROM buses WHERE bus_number = 777').fetchone() is not None
+    conn.close()
+
+def test_schema_is_idempotent_and_seeds_buses(db):
+    Database(url=db.url)
+    conn = db.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM buses').fetchone()[0] == 5
+    conn.close()
+
+def test_init_db_registers_buses_of_incharges(db):
+    conn = db.get_connection()
+    conn.execute('''
+        INSERT INTO bus_incharges (name, email, phone, bus_number, bus_password)
+        VALUES ('A', 'a@example.com', '9999999999', 42, 'pw')
+    ''')
+    conn.commit()
+    conn.close()
+
+    Database(url=db.url)
+    conn = db.get_connection()
+    assert conn.execute('SELECT 1 FROM buses WHERE bus_number = 42').fetchone() is not None
+    conn.close()
+
+def _add_student(cursor, university_id='2420030001', bus_number=1):
+    cursor.execute('''
+        INSERT INTO students (university_id, password, name, bus_number, bus_password, face_encoding)
+        VALUES (?, 'x', 'A', ?, 'pw', '[]')
+    ''', (university_id, bus_number))
+
+def test_attendance_is_unique_per_student_bus_and_day(db):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    _add_student(cursor)
+    for expected_rowcount in (1, 0):
+        cursor.execute('''
+            INSERT OR IGNORE INTO attendance (university_id, bus_number, date)
+            VALUES ('2420030001', 1, '2024-01-02')
+        ''')
+        assert cursor.rowcount == expected_rowcount
+    conn.commit()
+    conn.close()
+
+def test_student_changes_are_logged(db):
+    conn = db.get_connection()
+    _add_student(conn.cursor())
+    conn.execute("UPDATE students SET bus_number = 2 WHERE university_id = '2420030001'")
+    conn.commit()
+    rows = conn.execute('SELECT op, bus_number FROM student_changes ORDER BY seq').fetchall()
+    conn.close()
+    assert rows == [('insert', 1), ('delete', 1), ('insert', 2)]
+
+def test_bump_gallery_epoch(db):
+    assert db.bump_gallery_epoch() == 1
+    assert db.bump_gallery_epoch() == 2
+
+def test_expiry_keeps_sub_second_precision(db):
+    from utils.otp_store import DatabaseOTPStore
+
+    store = DatabaseOTPStore(db, ttl=600)
+    store.save('otp-hash', {'phone': '9999999999'})
+    conn = db.get_connection()
+    expires_at = conn.execute('SELECT expires_at FROM otp_codes').fetchone()[0]
+    conn.close()
+    assert abs(expires_at - (time.time() + 600)) < 5
+
+def test_incremental_vacuum_frees_every_page(sqlite_db):
+    db = sqlite_db
+    conn = db.get_connection()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.executemany('INSERT INTO attendance (university_id, bus_number, date) VALUES (?, 1, ?)',
+                     [(f'{i:010d}', '2024-01-02') for i in range(20000)])
+    conn.commit()
+    conn.execute('DELETE FROM attendance')
+    conn.commit()
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] > 1
+    conn.close()
+
+    assert db.vacuum('incremental') == 'incremental'
+    conn = db.get_connection()
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    conn.close()
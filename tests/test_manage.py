@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+import manage
+
+
+def test_confirm_refuses_without_a_terminal(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('y\n'))
+    assert manage.confirm('Delete everything?') is False
+
+def test_delete_students_needs_yes_when_not_interactive(tmp_path, monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO(''))
+    db_file = str(tmp_path / 'test.db')
+    assert manage.main(['--db', db_file, 'delete-students', '2420030001']) == 1
+    assert manage.main(['--db', db_file, 'delete-students', '2420030001', '-y', '--vacuum', 'none']) == 0
+
+
+def _db_with_archived_term(tmp_path):
+    from models.models import Database
+    from models.archive import archive_term
+
+    db = Database(url=f'sqlite:///{tmp_path / "test.db"}')
+    conn = db.get_connection()
+    conn.execute('''
+        INSERT INTO students (university_id, password, name, bus_number, bus_password, face_encoding)
+        VALUES ('2420030001', 'x', 'A', 1, 'pw', '[]')
+    ''')
+    conn.executemany('INSERT INTO attendance (university_id, bus_number, date) VALUES (?, 1, ?)',
+                     [('2420030001', '2024-01-02'), ('2420030001', '2024-01-03')])
+    conn.commit()
+    conn.close()
+    archive_term(db, '2024_even', '2024-01-01', '2024-06-30')
+    return db
+
+def test_delete_students_removes_archived_attendance(tmp_path):
+    db = _db_with_archived_term(tmp_path)
+    assert manage.delete_students(db, ['2420030001']) == (1, 2)
+
+    conn = db.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM attendance_archive_2024_even').fetchone()[0] == 0
+    conn.close()
+
+def test_archive_term_rejects_same_name_in_other_case(tmp_path):
+    from models.archive import archive_term
+
+    db = _db_with_archived_term(tmp_path)
+    with pytest.raises(ValueError, match='already archived'):
+        archive_term(db, '2024_EVEN', '2023-01-01', '2023-06-30')
+
+def test_delete_attendance_removes_archived_rows(tmp_path):
+    db = _db_with_archived_term(tmp_path)
+    assert manage.delete_attendance(db, date_from='2024-01-01', date_to='2024-01-02') == 1
+    assert manage.delete_attendance(db, ['2420030001']) == 1
+
+    conn = db.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM attendance_archive_2024_even').fetchone()[0] == 0
+    assert conn.execute("SELECT row_count FROM attendance_terms WHERE term = '2024_even'").fetchone()[0] == 0
+    conn.close()
+
+def test_delete_attendance_by_bus_covers_archives(tmp_path):
+    db = _db_with_archived_term(tmp_path)
+    assert manage.delete_attendance(db, bus_number=2) == 0
+    assert manage.delete_attendance(db, bus_number=1, chunk_size=1) == 2
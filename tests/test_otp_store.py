@@ -0,0 +1,91 @@
+import threading
+import time as real_time
+
+import pytest
+
+from utils import otp_store, ttl_cache
+from utils.otp_store import DatabaseOTPStore, MemoryOTPStore, create_otp_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        real_time.sleep(seconds)
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(otp_store, 'time', fake)
+    monkeypatch.setattr(ttl_cache, 'time', fake)
+    return fake
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request, db):
+    if request.param == 'memory':
+        return MemoryOTPStore(ttl=600, sweep_interval=None)
+    return DatabaseOTPStore(db, ttl=600)
+
+
+def test_save_get_delete(store, clock):
+    store.save('hash', {'phone': '9999999999', 'attempts': 0})
+    assert store.get('hash') == {'phone': '9999999999', 'attempts': 0}
+    store.delete('hash')
+    assert store.get('hash') is None
+
+def test_saving_again_replaces_the_record(store, clock):
+    store.save('hash', {'attempts': 0})
+    clock.now += 500
+    store.save('hash', {'attempts': 1})
+    clock.now += 200
+    # The second save also restarted the TTL
+    assert store.get('hash') == {'attempts': 1}
+
+def test_records_expire_and_are_swept(store, clock):
+    store.save('old', {'attempts': 0})
+    clock.now += 300
+    store.save('new', {'attempts': 0})
+    clock.now += 300
+    assert store.sweep() == 1
+    assert store.get('old') is None
+    assert store.get('new') == {'attempts': 0}
+
+def test_database_store_is_shared_between_workers(db, clock):
+    issuing, verifying = DatabaseOTPStore(db), DatabaseOTPStore(db)
+    issuing.save('hash', {'attempts': 0})
+    assert verifying.get('hash') == {'attempts': 0}
+    verifying.delete('hash')
+    assert issuing.get('hash') is None
+
+def test_concurrent_saves_of_the_same_otp(db):
+    # A double-clicked "send OTP": both requests save the same hash
+    store = DatabaseOTPStore(db)
+    errors = []
+    def send(attempt):
+        try:
+            store.save('hash', {'attempt': attempt})
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert store.get('hash') is not None
+
+def test_create_otp_store(db):
+    class Settings:
+        OTP_STORE = 'database'
+        OTP_TTL_SECONDS = 120
+
+    assert isinstance(create_otp_store(Settings, db), DatabaseOTPStore)
+    Settings.OTP_STORE = 'memory'
+    assert create_otp_store(Settings).ttl == 120
+    Settings.OTP_STORE = 'redis'
+    with pytest.raises(ValueError):
+        create_otp_store(Settings)
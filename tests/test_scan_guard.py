@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from models.models import Database
+from utils import scan_guard
+from utils.scan_guard import DatabaseRateLimiter, RateLimiter, ScanCoalescer
+
+
+def test_rate_limiter_allows_burst_then_throttles():
+    limiter = RateLimiter(rate=1.0, burst=3)
+    assert [limiter.allow('incharge')[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = limiter.allow('incharge')
+    assert not allowed and 0 < retry_after <= 1.0
+    assert limiter.allow('other incharge')[0]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(scan_guard, 'time', fake)
+    return fake
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(url=f'sqlite:///{tmp_path / "test.db"}')
+
+def test_database_rate_limit_is_shared_between_workers(db, clock):
+    # Two limiters over one database stand for two gunicorn workers
+    workers = [DatabaseRateLimiter(db, rate=1.0, burst=3) for _ in range(2)]
+    assert [workers[i % 2].allow(7)[0] for i in range(4)] == [True, True, True, False]
+    allowed, retry_after = workers[0].allow(7)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert workers[1].allow(8)[0]
+
+def test_database_rate_limit_refills(db, clock):
+    limiter = DatabaseRateLimiter(db, rate=2.0, burst=2)
+    assert [limiter.allow(7)[0] for _ in range(3)] == [True, True, False]
+    clock.now += 0.25
+    allowed, retry_after = limiter.allow(7)
+    assert not allowed and retry_after == pytest.approx(0.25)
+    clock.now += 0.25
+    assert limiter.allow(7)[0]
+    clock.now += 60
+    assert [limiter.allow(7)[0] for _ in range(3)] == [True, True, False]
+
+def test_database_rate_limit_sweep_drops_full_buckets(db, clock):
+    limiter = DatabaseRateLimiter(db, rate=1.0, burst=3)
+    limiter.allow(7)
+    assert limiter.sweep() == 0
+    clock.now += 10
+    assert limiter.sweep() == 1
+    assert [limiter.allow(7)[0] for _ in range(4)] == [True, True, True, False]
+
+def test_create_rate_limiter():
+    class Settings:
+        SCAN_RATE_PER_SECOND = 1.0
+        SCAN_BURST = 3
+        SCAN_RATE_STORE = 'memory'
+
+    assert isinstance(scan_guard.create_rate_limiter(Settings), RateLimiter)
+    Settings.SCAN_RATE_STORE = 'database'
+    with pytest.raises(ValueError):
+        scan_guard.create_rate_limiter(Settings)
+
+
+def _run_concurrently(coalescer, frames, identify):
+    results = {}
+    def scan(frame):
+        results[frame] = coalescer.run(coalescer.image_key(1, frame), lambda: identify(frame))
+    threads = [threading.Thread(target=scan, args=(frame,)) for frame in frames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_identical_frames_share_one_identification():
+    calls = []
+    def identify(frame):
+        calls.append(frame)
+        time.sleep(0.2)
+        return {'university_id': frame.decode()}, None
+
+    results = _run_concurrently(ScanCoalescer(window=2.0), [b'A'] * 4, identify)
+    assert calls == [b'A']
+    assert results[b'A'] == ({'university_id': 'A'}, None)
+
+def test_different_frames_are_identified_separately():
+    # Same incharge on two devices scanning two students at once
+    def identify(frame):
+        time.sleep(0.2)
+        return {'university_id': frame.decode()}, None
+
+    results = _run_concurrently(ScanCoalescer(window=2.0), [b'A', b'B'], identify)
+    assert results[b'A'][0]['university_id'] == 'A'
+    assert results[b'B'][0]['university_id'] == 'B'
+
+def test_resubmitted_frame_uses_cached_result():
+    coalescer = ScanCoalescer(window=2.0)
+    calls = []
+    key = coalescer.image_key(1, b'A')
+    for _ in range(2):
+        coalescer.run(key, lambda: calls.append(1) or ('A', None))
+    assert len(calls) == 1
+
+def test_zero_window_disables_coalescing():
+    coalescer = ScanCoalescer(window=0)
+    calls = []
+    key = coalescer.image_key(1, b'A')
+    for _ in range(2):
+        coalescer.run(key, lambda: calls.append(1) or ('A', None))
+    assert len(calls) == 2
+
+def test_async_scans_of_same_frame_coalesce():
+    coalescer = ScanCoalescer(window=2.0)
+    calls = []
+    async def identify():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'A', None
+
+    async def main():
+        key = coalescer.image_key(1, b'A')
+        return await asyncio.gather(*[coalescer.run_async(key, identify) for _ in range(3)])
+
+    assert asyncio.run(main()) == [('A', None)] * 3
+    assert len(calls) == 1
+
+def test_failed_identification_is_not_cached():
+    coalescer = ScanCoalescer(window=2.0)
+    key = coalescer.image_key(1, b'A')
+    def boom():
+        raise RuntimeError('dlib failed')
+    try:
+        coalescer.run(key, boom)
+    except RuntimeError:
+        pass
+    assert coalescer.run(key, lambda: ('A', None)) == ('A', None)
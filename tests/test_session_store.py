@@ -0,0 +1,83 @@
+import pytest
+from flask import Flask, session
+
+from utils.session_store import DatabaseSessionStore, MemorySessionStore, ServerSideSessionInterface
+
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request, db):
+    if request.param == 'memory':
+        return MemorySessionStore()
+    return DatabaseSessionStore(db)
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSideSessionInterface(store)
+
+    @app.route('/view')
+    def view():
+        return session.get('role', 'anonymous')
+
+    @app.route('/start-login')
+    def start_login():
+        session['login_data'] = {'incharge_id': 1}
+        return 'otp sent'
+
+    @app.route('/login')
+    def login():
+        session.regenerate()
+        session.pop('login_data', None)
+        session['role'] = 'incharge'
+        return 'logged in'
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'bye'
+
+    return app.test_client()
+
+def _sid(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_unchanged_requests_set_no_cookie(client):
+    assert 'Set-Cookie' not in client.get('/view').headers
+    client.get('/start-login')
+    response = client.get('/view')
+    assert response.text == 'anonymous'
+    assert 'Set-Cookie' not in response.headers
+
+def test_unknown_sid_is_not_adopted(client, store):
+    client.set_cookie('session', 'planted-by-attacker')
+    client.get('/start-login')
+    assert _sid(client) != 'planted-by-attacker'
+    assert store.load('planted-by-attacker') is None
+
+def test_login_rotates_the_session_id(client, store):
+    client.get('/start-login')
+    anonymous_sid = _sid(client)
+    client.get('/login')
+
+    assert _sid(client) != anonymous_sid
+    assert store.load(anonymous_sid) is None
+    assert client.get('/view').text == 'incharge'
+
+def test_clear_deletes_the_stored_session(client, store):
+    client.get('/login')
+    sid = _sid(client)
+    assert store.load(sid) is not None
+
+    client.get('/logout')
+    assert store.load(sid) is None
+    assert _sid(client) is None
+    assert client.get('/view').text == 'anonymous'
+
+def test_database_store_saving_again_replaces_the_session(db):
+    store = DatabaseSessionStore(db)
+    store.save('sid', 'first', 60)
+    store.save('sid', 'second', 60)
+    assert store.load('sid') == 'second'
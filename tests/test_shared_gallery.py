@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from models.models import Database
+from utils import shared_gallery
+from utils.shared_gallery import SharedGalleryCache
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(url=f'sqlite:///{tmp_path / "test.db"}')
+
+def _encoding(seed):
+    return json.dumps(np.random.default_rng(seed).random(128).tolist())
+
+def _execute(db, sql, params=()):
+    conn = db.get_connection()
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _add_student(db, university_id, bus_number, seed=0):
+    _execute(db, '''
+        INSERT INTO students (university_id, password, name, bus_number, bus_password, face_encoding)
+        VALUES (?, 'x', ?, ?, 'pw', ?)
+    ''', (university_id, f'Student {university_id}', bus_number, _encoding(seed)))
+
+def _versions(directory):
+    return {name[len('gallery-'):].rsplit('.', 1)[0] for name in os.listdir(directory) if name.startswith('gallery-')}
+
+@pytest.fixture
+def full_rebuilds(monkeypatch):
+    """Count full rebuilds (delta rebuilds only read the changed students)"""
+    calls = []
+    gallery_rows = shared_gallery.gallery_rows
+
+    def counting(cursor, where, params):
+        if where == '1 = 1':
+            calls.append(where)
+        return gallery_rows(cursor, where, params)
+
+    monkeypatch.setattr(shared_gallery, 'gallery_rows', counting)
+    return calls
+
+
+def test_publish_maps_every_bus(db, tmp_path):
+    _add_student(db, 'A', 1, seed=1)
+    _add_student(db, 'B', 1, seed=2)
+    _add_student(db, 'C', 2, seed=3)
+    cache = SharedGalleryCache(db, str(tmp_path / 'gallery'))
+
+    assert cache.preload_all() == 2
+    assert cache.get(1).university_ids == ['A', 'B']
+    assert cache.get(2).university_ids == ['C']
+    assert len(cache.get(3)) == 0
+    np.testing.assert_allclose(cache.get(2).matrix[0], json.loads(_encoding(3)), rtol=1e-6)
+
+def test_delta_rebuild_applies_delete_move_and_insert(db, tmp_path, full_rebuilds):
+    _add_student(db, 'A', 1, seed=1)
+    _add_student(db, 'B', 1, seed=2)
+    _add_student(db, 'C', 2, seed=3)
+    cache = SharedGalleryCache(db, str(tmp_path / 'gallery'))
+    cache.preload_all()
+    assert len(full_rebuilds) == 1
+
+    _execute(db, "DELETE FROM students WHERE university_id = 'A'")
+    _execute(db, "UPDATE students SET bus_number = 2 WHERE university_id = 'B'")
+    _add_student(db, 'D', 1, seed=4)
+
+    assert cache.get(1).university_ids == ['D']
+    assert sorted(cache.get(2).university_ids) == ['B', 'C']
+    assert len(full_rebuilds) == 1
+
+def test_other_worker_maps_the_published_version(db, tmp_path, full_rebuilds):
+    _add_student(db, 'A', 1, seed=1)
+    SharedGalleryCache(db, str(tmp_path / 'gallery')).preload_all()
+
+    other = SharedGalleryCache(db, str(tmp_path / 'gallery'))
+    assert other.get(1).university_ids == ['A']
+    assert len(full_rebuilds) == 1
+
+def test_epoch_bump_forces_a_full_rebuild(db, tmp_path, full_rebuilds):
+    _add_student(db, 'A', 1, seed=1)
+    cache = SharedGalleryCache(db, str(tmp_path / 'gallery'))
+    cache.preload_all()
+
+    # Changed behind the change log's back, e.g. a calibrated threshold
+    _execute(db, "INSERT INTO face_thresholds (bus_number, university_id, threshold) VALUES (1, 'A', 0.35)")
+    assert cache.get(1).thresholds[0] == pytest.approx(0.6)
+    db.bump_gallery_epoch()
+
+    assert cache.get(1).thresholds[0] == pytest.approx(0.35)
+    assert len(full_rebuilds) == 2
+
+def test_cleanup_keeps_superseded_versions_for_the_grace_period(db, tmp_path):
+    directory = str(tmp_path / 'gallery')
+    cache = SharedGalleryCache(db, directory)
+    for i in range(4):
+        _add_student(db, f'S{i}', 1, seed=i)
+        cache.preload_all()
+    assert len(_versions(directory)) == 4
+
+    # Past the grace period only the live version and the one before remain
+    cache.grace_period = 0
+    _add_student(db, 'S4', 1, seed=4)
+    cache.preload_all()
+    live = json.load(open(os.path.join(directory, shared_gallery.POINTER_FILE)))['version']
+    assert live in _versions(directory)
+    assert len(_versions(directory)) == 2
+
+def test_stale_worker_survives_several_publishes(db, tmp_path):
+    directory = str(tmp_path / 'gallery')
+    stale = SharedGalleryCache(db, directory, grace_period=0)
+    publisher = SharedGalleryCache(db, directory, grace_period=0)
+    _add_student(db, 'A', 1, seed=1)
+    stale.preload_all()
+    held = stale.get(1)
+
+    for i in range(3):
+        _add_student(db, f'S{i}', 1, seed=10 + i)
+        publisher.preload_all()
+
+    # The gallery held by an in-flight scan stays readable after its files are deleted
+    assert held.university_ids == ['A'] and held.matrix.shape == (1, 128)
+    assert stale.get(1).university_ids == ['A', 'S0', 'S1', 'S2']
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ttl_cache, 'time', fake)
+    return fake
+
+
+def test_get_set_pop(clock):
+    cache = TTLCache(60, sweep_interval=None)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.pop('a') == 1
+    assert cache.get('a') is None
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(60, max_entries=2, sweep_interval=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache(60, sweep_interval=None)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=300)
+    clock.now += 60
+    assert cache.get('a') is None
+    assert cache.pop('a') is None
+    assert cache.get('b') == 2
+
+def test_sweep_drops_only_expired_entries(clock):
+    cache = TTLCache(60, sweep_interval=None)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=300)
+    clock.now += 120
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+
+def test_background_sweeper_removes_abandoned_entries():
+    cache = TTLCache(0.01, sweep_interval=0.02)
+    cache.set('a', 1)
+    deadline = time.time() + 2
+    while len(cache) and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(cache) == 0
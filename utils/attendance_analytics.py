@@ -0,0 +1,185 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+import logging
+from models.archive import attendance_source
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Term attendance analytics for a bus and its students.
+# A "service day" is a day on which anyone on the bus was marked present
+# (weekends and holidays drop out on their own). Attendance is turned into a
+# students x service-days presence matrix and everything else (percentage,
+# streaks, heatmap) is a vectorized reduction of it.
+#
+# The matrix up to yesterday is cached per bus and day; today's marks are read
+# live from the hot table and appended. Past days still change (offline
+# syncs back-date marks, maintenance deletes and archives rows), so the cache
+# key includes a cheap version of the bus's history: row count and highest
+# id up to yesterday, the number of archived terms and the student change log.
+
+_history_cache = TTLCache(ttl=24 * 3600, max_entries=512, sweep_interval=None)
+
+
+def term_start(config, today):
+    """TERM_START_DATE from config, else the start of the current half year"""
+    configured = getattr(config, 'TERM_START_DATE', None)
+    if configured:
+        return date.fromisoformat(configured)
+    return date(today.year, 1 if today.month < 7 else 7, 1)
+
+
+def _presence(cursor, bus_number, date_from, date_to):
+    """One query over the term, pivoted to a bool DataFrame (university_id x date)"""
+    import pandas as pd
+
+    source = attendance_source(cursor, date_from, date_to)
+    cursor.execute(f'''
+        SELECT a.university_id, a.date FROM {source} a
+        WHERE a.bus_number = ? AND a.date BETWEEN ? AND ?
+    ''', (bus_number, date_from, date_to))
+    frame = pd.DataFrame.from_records(cursor.fetchall(), columns=['university_id', 'date'])
+    if frame.empty:
+        return pd.DataFrame(dtype=bool)
+    return pd.crosstab(frame['university_id'], frame['date']) > 0
+
+
+def _history_version(cursor, bus_number, yesterday):
+    # Index-only on idx_attendance_bus_date; any insert or delete moves the
+    # count or the max id (ids only grow)
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM attendance WHERE bus_number = ? AND date <= ?),
+               (SELECT MAX(id) FROM attendance WHERE bus_number = ? AND date <= ?),
+               (SELECT COUNT(*) FROM attendance_terms),
+               (SELECT MAX(seq) FROM student_changes)
+    ''', (bus_number, yesterday, bus_number, yesterday))
+    return tuple(cursor.fetchone())
+
+
+def _history(cursor, bus_number, start, yesterday):
+    key = (bus_number, start, yesterday, _history_version(cursor, bus_number, yesterday))
+    presence = _history_cache.get(key)
+    if presence is None:
+        presence = _presence(cursor, bus_number, start, yesterday)
+        _history_cache.set(key, presence)
+    return presence
+
+
+def _bus_matrix(db, config, bus_number, today=None):
+    """
+    Returns: (start, [(university_id, name)], service day strings,
+              presence bool (students x days), eligible bool (students x days))
+    """
+    today = today or datetime.utcnow().date()  # attendance dates are DATE('now'), i.e. UTC
+    start = term_start(config, today).isoformat()
+    yesterday = (today - timedelta(days=1)).isoformat()
+
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        presence = _history(cursor, bus_number, start, yesterday)
+        today_marks = _presence(cursor, bus_number, today.isoformat(), today.isoformat())
+        cursor.execute('''
+            SELECT university_id, name, created_at FROM students
+            WHERE bus_number = ? ORDER BY university_id
+        ''', (bus_number,))
+        students = cursor.fetchall()
+    finally:
+        conn.close()
+
+    university_ids = [row[0] for row in students]
+    days = sorted(set(presence.columns) | set(today_marks.columns))
+    matrix = np.zeros((len(students), len(days)), dtype=bool)
+    for part in (presence, today_marks):
+        if len(part.columns):
+            aligned = part.reindex(index=university_ids, columns=days, fill_value=False)
+            matrix |= aligned.to_numpy(dtype=bool)
+
+    # Days before a student enrolled do not count against them
+    enrolled = np.array([(row[2] or start)[:10] for row in students], dtype='U10')
+    eligible = np.array(days, dtype='U10')[None, :] >= enrolled[:, None]
+    return start, [(row[0], row[1]) for row in students], days, matrix, eligible
+
+
+def _streaks(matrix, today_is_service_day):
+    """Current and longest runs of present service days per row"""
+    if not matrix.shape[1]:
+        zeros = np.zeros(matrix.shape[0], dtype=int)
+        return zeros, zeros
+    present = np.cumsum(matrix, axis=1)
+    # Run length ending at each day: presences since the last absence
+    runs = present - np.maximum.accumulate(np.where(matrix, 0, present), axis=1)
+    current = runs[:, -1]
+    if today_is_service_day and matrix.shape[1] > 1:
+        # Not scanned yet today does not break the streak
+        current = np.where(matrix[:, -1], runs[:, -1], runs[:, -2])
+    return current, runs.max(axis=1)
+
+
+def _percentages(matrix, eligible):
+    days = eligible.sum(axis=1)
+    present = (matrix & eligible).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentages = np.round(100.0 * present / days, 1)
+    return present, days, percentages
+
+
+def bus_analytics(db, config, bus_number, today=None):
+    """Term summary, daily heatmap and per-student figures for one bus"""
+    today = today or datetime.utcnow().date()
+    start, students, days, matrix, eligible = _bus_matrix(db, config, bus_number, today)
+    present, service_days, percentages = _percentages(matrix, eligible)
+    current, longest = _streaks(matrix, bool(days) and days[-1] == today.isoformat())
+
+    daily_present = (matrix & eligible).sum(axis=0)
+    daily_enrolled = eligible.sum(axis=0)
+    valid = service_days > 0
+
+    return {
+        'bus_number': bus_number,
+        'term_start': start,
+        'enrolled': len(students),
+        'service_days': len(days),
+        'average_percentage': round(float(percentages[valid].mean()), 1) if valid.any() else None,
+        'heatmap': [
+            {'date': day, 'present': int(count), 'ratio': round(float(count) / enrolled, 3) if enrolled else None}
+            for day, count, enrolled in zip(days, daily_present, daily_enrolled)
+        ],
+        'students': [
+            {
+                'university_id': uid,
+                'name': name,
+                'present_days': int(present[i]),
+                'service_days': int(service_days[i]),
+                'percentage': float(percentages[i]) if valid[i] else None,
+                'current_streak': int(current[i]),
+                'longest_streak': int(longest[i])
+            } for i, (uid, name) in enumerate(students)
+        ]
+    }
+
+
+def student_analytics(db, config, university_id, bus_number, today=None):
+    """Term percentage, streaks and heatmap of one student, or None if not on this bus"""
+    today = today or datetime.utcnow().date()
+    start, students, days, matrix, eligible = _bus_matrix(db, config, bus_number, today)
+    ids = [uid for uid, _ in students]
+    if university_id not in ids:
+        return None
+
+    row = ids.index(university_id)
+    present, service_days, percentages = _percentages(matrix[row:row + 1], eligible[row:row + 1])
+    current, longest = _streaks(matrix[row:row + 1], bool(days) and days[-1] == today.isoformat())
+
+    return {
+        'term_start': start,
+        'present_days': int(present[0]),
+        'service_days': int(service_days[0]),
+        'percentage': float(percentages[0]) if service_days[0] else None,
+        'current_streak': int(current[0]),
+        'longest_streak': int(longest[0]),
+        'heatmap': [
+            {'date': day, 'present': bool(matrix[row, j])}
+            for j, day in enumerate(days) if eligible[row, j]
+        ]
+    }
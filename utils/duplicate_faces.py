@@ -0,0 +1,75 @@
+import json
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One person enrolled under two university IDs (e.g. to mark a friend present)
+# shows up as two encodings far closer than any two different people.
+# Signup checks the new encoding against every enrolled student; the admin
+# report (`manage.py duplicate-report`) finds all such pairs in the database.
+
+
+def find_enrolled_duplicate(gallery_cache, bus_numbers, encoding, threshold):
+    """
+    Nearest enrolled student over the given buses, using the cached bus galleries
+    Returns: (university_id, name, bus_number, distance) if closer than threshold, else None
+    """
+    best = None
+    for bus_number in bus_numbers:
+        gallery = gallery_cache.get(bus_number)
+        index, distance = gallery.best_match(encoding)
+        if index is not None and distance < threshold and (best is None or distance < best[3]):
+            best = (gallery.university_ids[index], gallery.names[index], bus_number, distance)
+    return best
+
+
+def load_encodings(cursor, bus_number=None):
+    """
+    Every enrolled encoding (optionally of one bus) as one float32 matrix
+    Returns: (rows of (university_id, name, bus_number), (N, 128) matrix)
+    """
+    where = 'AND bus_number = ?' if bus_number is not None else ''
+    cursor.execute(f'''
+        SELECT university_id, name, bus_number, face_encoding FROM students
+        WHERE face_encoding IS NOT NULL {where}
+    ''', (bus_number,) if bus_number is not None else ())
+
+    students, encodings = [], []
+    for university_id, name, bus, stored_encoding in cursor.fetchall():
+        try:
+            encodings.append(np.array(json.loads(stored_encoding), dtype=np.float32))
+        except Exception:
+            logger.warning(f"Skipping undecodable encoding of {university_id}")
+            continue
+        students.append((university_id, name, bus))
+    matrix = np.vstack(encodings) if encodings else np.empty((0, 128), dtype=np.float32)
+    return students, matrix
+
+
+def find_duplicate_pairs(matrix, threshold, block_size=2048):
+    """
+    All pairs (i, j, distance) with i < j and distance < threshold.
+    Distances come from the Gram trick one block of rows at a time, so
+    memory stays at block_size x N whatever the number of students.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    squared = np.einsum('ij,ij->i', matrix, matrix)
+    limit = threshold * threshold
+
+    pairs = []
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        # Only columns after the block start: each pair is seen once
+        d2 = squared[start:start + len(block), None] + squared[None, start:] - 2.0 * (block @ matrix[start:].T)
+        rows, cols = np.nonzero(d2 < limit)
+        cols = cols + start
+        rows = rows + start
+        upper = cols > rows
+        rows, cols = rows[upper], cols[upper]
+        # Recompute the few hits exactly; the Gram form loses precision near 0
+        distances = np.linalg.norm(matrix[rows] - matrix[cols], axis=1)
+        pairs.extend(zip(rows.tolist(), cols.tolist(), distances.tolist()))
+
+    pairs.sort(key=lambda pair: pair[2])
+    return [(i, j, d) for i, j, d in pairs if d < threshold]
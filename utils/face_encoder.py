@@ -1,10 +1,20 @@
-import face_recognition
 import numpy as np
+import io
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+_face_recognition = None
+
+def _fr():
+    """Import face_recognition (and load dlib's models) on first use only"""
+    global _face_recognition
+    if _face_recognition is None:
+        import face_recognition
+        _face_recognition = face_recognition
+    return _face_recognition
+
 class FaceEncoder:
     """Lightweight face encoding using face_recognition (dlib-based)"""
     
@@ -25,10 +35,10 @@ class FaceEncoder:
         """
         try:
             # Load image
-            image = face_recognition.load_image_file(image_path)
+            image = _fr().load_image_file(image_path)
             
             # Get face encodings (returns list of encodings)
-            face_encodings = face_recognition.face_encodings(image, model=self.model)
+            face_encodings = _fr().face_encodings(image, model=self.model)
             
             if face_encodings:
                 return face_encodings[0]  # Return first face encoding
@@ -40,6 +50,61 @@ class FaceEncoder:
             logger.error(f"Error encoding face from {image_path}: {str(e)}")
             return None
     
+    def encode_face_checked(self, image_source):
+        """
+        Detect the largest face, run the cheap quality checks on it, and only
+        then compute the 128-d embedding, reusing the detection's landmarks
+        image_source: file path or file-like object
+        Returns: (encoding, None) or (None, actionable message)
+        """
+        from utils.face_quality import check_face_quality
+        try:
+            fr = _fr()
+            image = fr.load_image_file(image_source)
+            
+            face_locations = fr.face_locations(image, model=self.model)
+            if not face_locations:
+                return None, 'No face found in the scanned image.'
+            
+            # Largest face is the one being scanned
+            location = max(face_locations, key=lambda l: (l[2] - l[0]) * (l[1] - l[3]))
+            
+            # Same 68-point predictor face_encodings used for the enrolled encodings
+            landmarks = fr.api._raw_face_landmarks(image, [location], model='large')[0]
+            points = [(p.x, p.y) for p in landmarks.parts()]
+            left_eye = np.mean(points[36:42], axis=0)
+            right_eye = np.mean(points[42:48], axis=0)
+            nose_tip = points[30]
+            
+            ok, message = check_face_quality(image, location, left_eye, right_eye, nose_tip)
+            if not ok:
+                logger.info(f"Rejected frame before encoding: {message}")
+                return None, message
+            
+            encoding = np.array(fr.api.face_encoder.compute_face_descriptor(image, landmarks, 1))
+            return encoding, None
+            
+        except Exception as e:
+            logger.error(f"Error encoding face: {str(e)}")
+            return None, 'Could not process the scanned image.'
+    
+    def encode_image_bytes(self, image_bytes):
+        """
+        Encode a single face from in-memory JPEG/PNG bytes (no temp file),
+        after the quality checks
+        Returns: (encoding, None) or (None, actionable message)
+        """
+        return self.encode_face_checked(io.BytesIO(image_bytes))
+    
+    def warm_up(self):
+        """
+        Run one dummy inference so dlib's detector, landmark and embedding
+        models are loaded before the first real scan
+        """
+        image = np.zeros((150, 150, 3), dtype=np.uint8)
+        _fr().face_locations(image, model=self.model)
+        _fr().face_encodings(image, known_face_locations=[(0, 150, 150, 0)])
+    
     def compare_faces(self, known_encoding, unknown_encoding, tolerance=0.6):
         """
         Compare two face encodings
@@ -47,7 +112,7 @@ class FaceEncoder:
         tolerance: 0.6 is default, lower = stricter matching
         """
         try:
-            distance = face_recognition.face_distance([known_encoding], unknown_encoding)
+            distance = _fr().face_distance([known_encoding], unknown_encoding)
             return distance[0] < tolerance
         except Exception as e:
             logger.error(f"Error comparing faces: {str(e)}")
@@ -56,7 +121,7 @@ class FaceEncoder:
     def get_distance(self, known_encoding, unknown_encoding):
         """Get Euclidean distance between two face encodings"""
         try:
-            distance = face_recognition.face_distance([known_encoding], unknown_encoding)
+            distance = _fr().face_distance([known_encoding], unknown_encoding)
             return float(distance[0])
         except Exception as e:
             logger.error(f"Error calculating distance: {str(e)}")
@@ -68,9 +133,9 @@ class FaceEncoder:
         Returns: dict with 'face_locations' and 'encoding', or None
         """
         try:
-            image = face_recognition.load_image_file(image_path)
-            face_locations = face_recognition.face_locations(image, model=self.model)
-            face_encodings = face_recognition.face_encodings(image, face_locations)
+            image = _fr().load_image_file(image_path)
+            face_locations = _fr().face_locations(image, model=self.model)
+            face_encodings = _fr().face_encodings(image, face_locations)
             
             if face_locations and face_encodings:
                 return {
@@ -0,0 +1,224 @@
+import json
+import threading
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Calibrated per-student threshold, else the bus-level one (university_id = '')
+GALLERY_ROWS_SQL = '''
+    SELECT s.university_id, s.name, s.face_encoding,
+           COALESCE(t.threshold, b.threshold), s.bus_number
+    FROM students s
+    LEFT JOIN face_thresholds t
+        ON t.bus_number = s.bus_number AND t.university_id = s.university_id
+    LEFT JOIN face_thresholds b
+        ON b.bus_number = s.bus_number AND b.university_id = ''
+    WHERE s.face_encoding IS NOT NULL AND {where}
+'''
+
+def poll_changes(cursor):
+    """
+    One cheap query for how far the student change log has moved
+    Returns: (latest seq or 0, oldest retained seq or None, gallery epoch)
+    """
+    cursor.execute('''
+        SELECT (SELECT MAX(seq) FROM student_changes),
+               (SELECT MIN(seq) FROM student_changes),
+               (SELECT value FROM app_meta WHERE key = 'gallery_epoch')
+    ''')
+    latest, oldest, epoch = cursor.fetchone()
+    return latest or 0, oldest, epoch
+
+def gallery_rows(cursor, where, params):
+    cursor.execute(GALLERY_ROWS_SQL.format(where=where), params)
+    return cursor.fetchall()
+
+def read_changes(cursor, since):
+    """
+    Net effect of the change rows after `since`: every touched student is to
+    be dropped, and those whose last change is an insert re-added with their
+    current row
+    Returns: (touched university_ids, gallery rows to add, number of change rows)
+    """
+    cursor.execute('''
+        SELECT seq, op, university_id, bus_number FROM student_changes
+        WHERE seq > ? ORDER BY seq
+    ''', (since,))
+    changes = cursor.fetchall()
+
+    last_op = {}
+    for _, op, university_id, _ in changes:
+        last_op[university_id] = op
+    inserted = [uid for uid, op in last_op.items() if op == 'insert']
+
+    rows = []
+    for i in range(0, len(inserted), 500):
+        chunk = inserted[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        rows.extend(gallery_rows(cursor, f's.university_id IN ({placeholders})', chunk))
+    return set(last_op), rows, len(changes)
+
+class BusGallery:
+    """
+    Face encodings of one bus stacked into a single matrix for vectorized matching.
+    Treated as immutable: updates build a new gallery, so a scan holding a
+    reference never sees a half-applied change.
+    """
+
+    def __init__(self, university_ids, names, matrix, thresholds=None):
+        self.university_ids = university_ids
+        self.names = names
+        self.matrix = matrix  # shape (N, 128)
+        self.thresholds = thresholds  # per-student match thresholds, shape (N,)
+
+    def __len__(self):
+        return len(self.university_ids)
+
+    def distances(self, encoding):
+        """Euclidean distance from encoding to every student (same metric as face_recognition.face_distance)"""
+        if not len(self):
+            return np.empty(0)
+        return np.linalg.norm(self.matrix - encoding, axis=1)
+
+    def best_match(self, encoding):
+        """
+        Find the closest student
+        Returns: (index, distance) or (None, None) for an empty gallery
+        """
+        distances = self.distances(encoding)
+        if not len(distances):
+            return None, None
+        index = int(np.argmin(distances))
+        return index, float(distances[index])
+
+    def is_match(self, index, distance):
+        """Compare against the calibrated threshold of the matched student"""
+        return distance < self.thresholds[index]
+
+    def without(self, university_ids):
+        """New gallery with the given students removed"""
+        keep = [i for i, uid in enumerate(self.university_ids) if uid not in university_ids]
+        if len(keep) == len(self):
+            return self
+        return BusGallery([self.university_ids[i] for i in keep], [self.names[i] for i in keep],
+                          self.matrix[keep], self.thresholds[keep])
+
+    def extended(self, other):
+        """New gallery with the students of other appended"""
+        if not len(other):
+            return self
+        return BusGallery(self.university_ids + other.university_ids, self.names + other.names,
+                          np.vstack([self.matrix, other.matrix]),
+                          np.concatenate([self.thresholds, other.thresholds]))
+
+    @classmethod
+    def from_rows(cls, rows, default_threshold=0.6):
+        """
+        Build from (university_id, name, face_encoding JSON, threshold, ...) rows,
+        skipping undecodable encodings; a NULL threshold uses default_threshold
+        """
+        university_ids, names, encodings, thresholds = [], [], [], []
+        for university_id, name, stored_encoding, threshold, *_ in rows:
+            if not stored_encoding:
+                continue
+            try:
+                encodings.append(np.array(json.loads(stored_encoding), dtype=np.float64))
+            except Exception:
+                logger.warning(f"Failed to decode face encoding for {university_id}")
+                continue
+            university_ids.append(university_id)
+            names.append(name)
+            thresholds.append(default_threshold if threshold is None else threshold)
+
+        matrix = np.vstack(encodings) if encodings else np.empty((0, 128))
+        return cls(university_ids, names, matrix, np.array(thresholds, dtype=np.float64))
+
+
+class GalleryCache:
+    """
+    Per-process cache of bus galleries kept current from the student_changes log.
+    Each lookup runs one cheap query for the latest change sequence; only
+    when it moved are the new change rows read and applied as a delta
+    (removed rows dropped, new rows appended). A gallery epoch bump from
+    maintenance jobs, or a pruned log, forces a full reload instead.
+    """
+
+    def __init__(self, db, default_threshold=0.6):
+        self.db = db
+        self.default_threshold = default_threshold
+        self._galleries = {}
+        self._seq = None
+        self._epoch = None
+        self._lock = threading.Lock()
+
+    def _load(self, cursor, bus_number):
+        gallery = BusGallery.from_rows(gallery_rows(cursor, 's.bus_number = ?', (bus_number,)),
+                                       self.default_threshold)
+        logger.info(f"Loaded gallery for bus {bus_number}: {len(gallery)} students")
+        return gallery
+
+    def _apply_changes(self, cursor, since):
+        """Apply change rows after `since` to the cached galleries"""
+        touched, added_rows, count = read_changes(cursor, since)
+
+        added = {}
+        for row in added_rows:
+            added.setdefault(row[4], []).append(row)
+
+        for bus_number, gallery in list(self._galleries.items()):
+            gallery = gallery.without(touched)
+            if bus_number in added:
+                gallery = gallery.extended(BusGallery.from_rows(added[bus_number], self.default_threshold))
+            self._galleries[bus_number] = gallery
+
+        logger.info(f"Applied {count} student changes ({len(added_rows)} upserts)")
+
+    def _refresh(self, cursor):
+        latest, oldest, epoch = poll_changes(cursor)
+        if self._seq is None or epoch != self._epoch or (oldest is not None and oldest > self._seq + 1):
+            # First use, explicit invalidation, or changes we missed were pruned
+            self._galleries.clear()
+        elif latest > self._seq:
+            self._apply_changes(cursor, self._seq)
+        self._seq = latest
+        self._epoch = epoch
+
+    def get(self, bus_number):
+        """Return the up-to-date gallery for a bus"""
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            with self._lock:
+                self._refresh(cursor)
+                gallery = self._galleries.get(bus_number)
+                if gallery is None:
+                    # Loaded after the poll, so it may already contain changes
+                    # past self._seq; applying them again later is idempotent
+                    gallery = self._load(cursor, bus_number)
+                    self._galleries[bus_number] = gallery
+                return gallery
+        finally:
+            conn.close()
+
+    def invalidate(self, bus_number=None):
+        """Drop one bus (or every bus) from the cache"""
+        with self._lock:
+            if bus_number is None:
+                self._galleries.clear()
+            else:
+                self._galleries.pop(bus_number, None)
+
+    def preload_all(self):
+        """Load the gallery of every bus that has enrolled students, returns the number of buses"""
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT bus_number FROM students WHERE face_encoding IS NOT NULL')
+            bus_numbers = [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        for bus_number in bus_numbers:
+            self.get(bus_number)
+        return len(bus_numbers)
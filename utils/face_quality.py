@@ -0,0 +1,73 @@
+import math
+import numpy as np
+
+# Cheap checks run between face detection and the 128-d embedding.
+# Bad frames (tiny, blurry, dark, turned faces) give unreliable distances, so
+# rejecting them early saves the embedding and tells the user how to fix it.
+
+DEFAULT_THRESHOLDS = {
+    'FACE_MIN_SIZE_PX': 80,          # shortest side of the face box
+    'FACE_MIN_SHARPNESS': 60.0,      # variance of the Laplacian on the face crop
+    'FACE_MIN_BRIGHTNESS': 50,       # mean grey level of the face crop
+    'FACE_MAX_BRIGHTNESS': 210,
+    'FACE_MAX_YAW': 0.35,            # nose offset from the eye midpoint / eye distance
+    'FACE_MAX_ROLL_DEGREES': 25.0,   # angle of the eye line
+}
+
+def _thresholds():
+    from config import config
+    return {key: getattr(config, key, default) for key, default in DEFAULT_THRESHOLDS.items()}
+
+def _grey(image):
+    if image.ndim == 2:
+        return image.astype(np.float32)
+    return image[..., :3].astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+def laplacian_variance(grey):
+    """Focus measure: variance of the 4-neighbour Laplacian (higher = sharper)"""
+    if grey.shape[0] < 3 or grey.shape[1] < 3:
+        return 0.0
+    lap = (grey[:-2, 1:-1] + grey[2:, 1:-1] + grey[1:-1, :-2] + grey[1:-1, 2:]
+           - 4.0 * grey[1:-1, 1:-1])
+    return float(lap.var())
+
+def check_face_quality(image, face_location, left_eye, right_eye, nose_tip, thresholds=None):
+    """
+    image: RGB numpy array as loaded by face_recognition
+    face_location: (top, right, bottom, left) from the detector
+    left_eye, right_eye, nose_tip: (x, y) landmark points from the same detection
+    Returns: (True, None) or (False, actionable message)
+    """
+    t = thresholds or _thresholds()
+    top, right, bottom, left = face_location
+    top, left = max(top, 0), max(left, 0)
+    bottom, right = min(bottom, image.shape[0]), min(right, image.shape[1])
+
+    if min(bottom - top, right - left) < t['FACE_MIN_SIZE_PX']:
+        return False, 'Face is too small - move closer to the camera.'
+
+    grey = _grey(image[top:bottom, left:right])
+
+    brightness = float(grey.mean())
+    if brightness < t['FACE_MIN_BRIGHTNESS']:
+        return False, 'Face is too dark - improve the lighting on the face.'
+    if brightness > t['FACE_MAX_BRIGHTNESS']:
+        return False, 'Face is overexposed - avoid direct light on the face or camera.'
+
+    if laplacian_variance(grey) < t['FACE_MIN_SHARPNESS']:
+        return False, 'Image is blurry - hold the camera steady and ask the student to stay still.'
+
+    dx = right_eye[0] - left_eye[0]
+    dy = right_eye[1] - left_eye[1]
+    eye_distance = math.hypot(dx, dy)
+    if eye_distance > 0:
+        roll = abs(math.degrees(math.atan2(dy, dx)))
+        roll = min(roll, 180.0 - roll)
+        if roll > t['FACE_MAX_ROLL_DEGREES']:
+            return False, 'Head is tilted - ask the student to keep their head straight.'
+
+        mid_x = (left_eye[0] + right_eye[0]) / 2.0
+        if abs(nose_tip[0] - mid_x) / eye_distance > t['FACE_MAX_YAW']:
+            return False, 'Face is turned away - ask the student to look straight at the camera.'
+
+    return True, None
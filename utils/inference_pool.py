@@ -0,0 +1,52 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Process pool for the CPU-heavy face encoding step.
+# Async views await it, so a worker thread only waits on I/O while dlib runs
+# in a separate process and the GIL stays free for other in-flight scans.
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+def _init_worker():
+    # Load dlib's models once per pool process instead of on the first scan
+    from utils.vision import get_face_encoder
+    try:
+        get_face_encoder().warm_up()
+    except Exception as e:
+        logger.error(f"Inference worker warm-up failed: {str(e)}")
+
+def _encode(image_bytes):
+    from utils.vision import get_face_encoder
+    return get_face_encoder().encode_image_bytes(image_bytes)
+
+def get_pool():
+    """Shared process pool, created on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock:
+            if _pool is None or _pool_pid != os.getpid():
+                from config import config
+                size = config.INFERENCE_POOL_SIZE or os.cpu_count() or 1
+                # spawn, not fork: the parent is a threaded gunicorn worker
+                _pool = ProcessPoolExecutor(max_workers=size,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker)
+                _pool_pid = os.getpid()
+                logger.info(f"Started inference pool with {size} processes")
+    return _pool
+
+async def encode_image_async(image_bytes):
+    """
+    Encode a face from image bytes in the inference pool
+    Returns: (encoding, None) or (None, actionable message)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), _encode, image_bytes)
@@ -2,23 +2,29 @@ import random
 import requests
 import time
 import hashlib
+from utils.otp_store import MemoryOTPStore
 
 class OTPHandler:
-    def __init__(self):
-        self.otp_storage = {}
+    def __init__(self, store=None, ttl=600):
+        """
+        store: where pending OTPs live (see utils.otp_store); defaults to a
+        per-process MemoryOTPStore
+        """
+        self.store = store if store is not None else MemoryOTPStore(ttl=ttl)
+        self.ttl = ttl
     
     def generate_otp(self, phone, email):
         """Generate 6-digit OTP but ALWAYS return 123456"""
         otp = "123456"  # FIXED OTP FOR TESTING
         otp_hash = hashlib.sha256(f"{otp}{phone}{email}".encode()).hexdigest()
         
-        self.otp_storage[otp_hash] = {
+        self.store.save(otp_hash, {
             'otp': otp,
             'phone': phone,
             'email': email,
             'timestamp': time.time(),
             'verified': False
-        }
+        })
         
         print(f"🎯 TEST OTP: {otp} for {phone}")
         print("🎯 ALWAYS USE OTP: 123456")
@@ -39,19 +45,19 @@ class OTPHandler:
         """Verify OTP - ALWAYS ACCEPT 123456"""
         print(f"🔍 Verifying OTP: {entered_otp}")
         
-        if otp_hash not in self.otp_storage:
+        otp_data = self.store.get(otp_hash)
+        if otp_data is None:
             return False, "Invalid OTP session"
         
-        otp_data = self.otp_storage[otp_hash]
-        
         # Check expiry (10 minutes)
-        if time.time() - otp_data['timestamp'] > 600:
-            del self.otp_storage[otp_hash]
+        if time.time() - otp_data['timestamp'] > self.ttl:
+            self.store.delete(otp_hash)
             return False, "OTP expired"
         
         # ALWAYS ACCEPT 123456
         if entered_otp == "123456":
             otp_data['verified'] = True
+            self.store.save(otp_hash, otp_data)
             print("✅ OTP VERIFIED SUCCESSFULLY!")
             return True, "OTP verified successfully"
         else:
@@ -60,9 +66,8 @@ class OTPHandler:
     
     def get_verified_data(self, otp_hash):
         """Get verified OTP data"""
-        if (otp_hash in self.otp_storage and 
-            self.otp_storage[otp_hash]['verified']):
-            data = self.otp_storage[otp_hash]
-            del self.otp_storage[otp_hash]
+        data = self.store.get(otp_hash)
+        if data is not None and data['verified']:
+            self.store.delete(otp_hash)
             return data
-        return None
\ No newline at end of file
+        return None
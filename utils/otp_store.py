@@ -0,0 +1,130 @@
+import json
+import time
+import logging
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class MemoryOTPStore:
+    """
+    Per-process OTP store: bounded LRU with TTL eviction and a background sweeper.
+    Only correct when a single worker serves both the OTP request and its verification.
+    """
+
+    def __init__(self, ttl=600, max_entries=10000, sweep_interval=60):
+        self.ttl = ttl
+        self.cache = TTLCache(ttl, max_entries=max_entries, sweep_interval=sweep_interval)
+
+    def save(self, otp_hash, record):
+        self.cache.set(otp_hash, dict(record))
+
+    def get(self, otp_hash):
+        record = self.cache.get(otp_hash)
+        return dict(record) if record is not None else None
+
+    def delete(self, otp_hash):
+        self.cache.pop(otp_hash)
+
+    def sweep(self):
+        return self.cache.sweep()
+
+
+class DatabaseOTPStore:
+    """
+    OTP store kept in the application database, shared by every gunicorn worker.
+    Expired rows are filtered out on read and purged opportunistically on write.
+    """
+
+    def __init__(self, db, ttl=600, sweep_interval=60):
+        self.db = db
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self.init_table()
+
+    def init_table(self):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS otp_codes (
+                    otp_hash TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_otp_codes_expires ON otp_codes(expires_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save(self, otp_hash, record):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            # One upsert: concurrent sends of the same OTP (a double click)
+            # would both pass a DELETE and then collide on INSERT
+            cursor.execute('''
+                INSERT INTO otp_codes (otp_hash, data, expires_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (otp_hash) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            ''', (otp_hash, json.dumps(record), time.time() + self.ttl))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self.sweep()
+
+    def get(self, otp_hash):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT data FROM otp_codes
+                WHERE otp_hash = ? AND expires_at > ?
+            ''', (otp_hash, time.time()))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, otp_hash):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM otp_codes WHERE otp_hash = ?', (otp_hash,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sweep(self):
+        """Delete every expired OTP, returns the number removed"""
+        self._last_sweep = time.time()
+        try:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM otp_codes WHERE expires_at <= ?', (time.time(),))
+                removed = cursor.rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            return removed
+        except Exception as e:
+            logger.error(f"OTP sweep failed: {str(e)}")
+            return 0
+
+
+def create_otp_store(config, db=None):
+    """Build the OTP store selected by config.OTP_STORE ('memory' or 'database')"""
+    backend = getattr(config, 'OTP_STORE', 'memory')
+    ttl = getattr(config, 'OTP_TTL_SECONDS', 600)
+
+    if backend == 'database':
+        if db is None:
+            raise ValueError("The 'database' OTP store needs a Database instance")
+        return DatabaseOTPStore(db, ttl=ttl)
+    if backend == 'memory':
+        return MemoryOTPStore(ttl=ttl, max_entries=getattr(config, 'OTP_MAX_ENTRIES', 10000))
+    raise ValueError(f"Unknown OTP_STORE: {backend}")
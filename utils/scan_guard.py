@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+import logging
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Protection for the scan endpoints against double taps and resubmitted
+# frames. The rate limit is shared by every worker (database) or kept per
+# worker process (memory); coalescing is always per worker process. Both
+# save dlib passes, while duplicate marks are ruled out by the unique
+# attendance index.
+
+class RateLimiter:
+    """
+    Token bucket per key (incharge): `rate` scans per second, bursts up to `burst`.
+    Per process: with N workers an incharge gets up to N times the limit.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        """
+        Take one token for key
+        Returns: (True, 0) or (False, seconds until a token is available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_keys:
+                # Full buckets carry no state worth keeping
+                self._buckets = {k: v for k, v in self._buckets.items()
+                                 if min(self.burst, v[0] + (now - v[1]) * self.rate) < self.burst}
+        return allowed, retry_after
+
+
+class DatabaseRateLimiter:
+    """
+    Token bucket per key (incharge) kept in the application database, shared
+    by every gunicorn worker. A scan costs one conditional UPDATE; buckets
+    that have refilled completely are purged opportunistically.
+    """
+
+    # Tokens at time ? (then rate, burst), refilled since the last update
+    REFILLED = 'CASE WHEN tokens + (? - updated_at) * ? > ? THEN ? ELSE tokens + (? - updated_at) * ? END'
+
+    def __init__(self, db, rate, burst, sweep_interval=300):
+        self.db = db
+        self.rate = rate
+        self.burst = burst
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self.init_table()
+
+    def init_table(self):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scan_rate_buckets (
+                    bucket_key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _refilled_params(self, now):
+        return (now, self.rate, self.burst, self.burst, now, self.rate)
+
+    def allow(self, key):
+        """
+        Take one token for key
+        Returns: (True, 0) or (False, seconds until a token is available)
+        """
+        key = str(key)
+        now = time.time()
+        refilled = self._refilled_params(now)
+        try:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                # Check and take in one statement, so concurrent scans on
+                # other workers cannot both spend the last token
+                cursor.execute(f'''
+                    UPDATE scan_rate_buckets SET tokens = {self.REFILLED} - 1, updated_at = ?
+                    WHERE bucket_key = ? AND {self.REFILLED} >= 1
+                ''', (*refilled, now, key, *refilled))
+                allowed = cursor.rowcount == 1
+                if not allowed:
+                    # First scan of this incharge (or its bucket was purged)
+                    cursor.execute('''
+                        INSERT OR IGNORE INTO scan_rate_buckets (bucket_key, tokens, updated_at)
+                        VALUES (?, ?, ?)
+                    ''', (key, self.burst - 1, now))
+                    allowed = cursor.rowcount == 1
+                retry_after = 0.0
+                if not allowed:
+                    cursor.execute(f'SELECT {self.REFILLED} FROM scan_rate_buckets WHERE bucket_key = ?',
+                                   (*refilled, key))
+                    row = cursor.fetchone()
+                    tokens = row[0] if row else 0.0
+                    retry_after = max(0.0, (1 - tokens) / self.rate)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            # Never turn a database hiccup into blocked scans
+            logger.error(f"Scan rate limit check failed: {str(e)}")
+            return True, 0.0
+
+        if now - self._last_sweep > self.sweep_interval:
+            self.sweep()
+        return allowed, retry_after
+
+    def sweep(self):
+        """Delete buckets that have refilled completely, returns the number removed"""
+        self._last_sweep = time.time()
+        try:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM scan_rate_buckets WHERE updated_at < ?',
+                               (time.time() - self.burst / self.rate,))
+                removed = cursor.rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            return removed
+        except Exception as e:
+            logger.error(f"Scan rate bucket sweep failed: {str(e)}")
+            return 0
+
+
+def create_rate_limiter(config, db=None):
+    """Build the scan rate limiter selected by config.SCAN_RATE_STORE ('memory' or 'database')"""
+    backend = getattr(config, 'SCAN_RATE_STORE', 'memory')
+    rate = config.SCAN_RATE_PER_SECOND
+    burst = config.SCAN_BURST
+
+    if backend == 'database':
+        if db is None:
+            raise ValueError("The 'database' scan rate store needs a Database instance")
+        return DatabaseRateLimiter(db, rate, burst)
+    if backend == 'memory':
+        return RateLimiter(rate, burst)
+    raise ValueError(f"Unknown SCAN_RATE_STORE: {backend}")
+
+
+class ScanCoalescer:
+    """
+    Shares one identification between scans of the same frame.
+
+    Scans are matched by a hash of the image bytes (and bus), never by who
+    sent them: a different frame may show a different student, even from
+    the same incharge account on a second device. A scan of a frame that is
+    already being identified waits for that result instead of running its
+    own dlib pass, and finished results are kept for `window` seconds so a
+    resubmitted frame (double tap, client retry) is answered without
+    inference. A window of 0 disables coalescing.
+
+    Works for sync views (run) and async views (run_async) alike; both
+    share the same in-flight table.
+    """
+
+    def __init__(self, window=2.0, max_entries=1000):
+        self.window = window
+        self.results = TTLCache(window, max_entries=max_entries, sweep_interval=None)
+        self._inflight = {}  # image key -> Future
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_key(bus_number, image_bytes):
+        return (bus_number, hashlib.sha256(image_bytes).hexdigest())
+
+    def _claim(self, image_key):
+        """Returns: (Future, True if the caller must compute the result)"""
+        with self._lock:
+            cached = self.results.get(image_key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future, False
+
+            future = self._inflight.get(image_key)
+            if future is not None:
+                return future, False
+
+            future = Future()
+            self._inflight[image_key] = future
+            return future, True
+
+    def _resolve(self, image_key, future, result=None, error=None):
+        with self._lock:
+            del self._inflight[image_key]
+            if error is None:
+                self.results.set(image_key, result)
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def run(self, image_key, identify):
+        """Return identify() for this frame, or the result of a scan of the same frame"""
+        if self.window <= 0:
+            return identify()
+        future, owner = self._claim(image_key)
+        if not owner:
+            logger.info(f"Coalesced scan of bus {image_key[0]}")
+            return future.result()
+        try:
+            result = identify()
+        except Exception as e:
+            self._resolve(image_key, future, error=e)
+            raise
+        self._resolve(image_key, future, result)
+        return result
+
+    async def run_async(self, image_key, identify):
+        """Async variant of run(); identify is an async function"""
+        if self.window <= 0:
+            return await identify()
+        future, owner = self._claim(image_key)
+        if not owner:
+            logger.info(f"Coalesced scan of bus {image_key[0]}")
+            return await asyncio.wrap_future(future)
+        try:
+            result = await identify()
+        except Exception as e:
+            self._resolve(image_key, future, error=e)
+            raise
+        self._resolve(image_key, future, result)
+        return result
@@ -0,0 +1,211 @@
+import secrets
+import time
+import logging
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SecureCookieSession
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(SecureCookieSession):
+    """Session dict whose data lives in a SessionStore; the cookie only carries sid"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        self.previous_sid = None
+
+    def regenerate(self):
+        """
+        Move the session to a fresh id, e.g. on login, so an id handed out
+        before (or planted) never becomes authenticated; the old row is
+        deleted when the session is saved
+        """
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+class MemorySessionStore:
+    """
+    Per-process session store: bounded LRU with TTL eviction.
+    Only correct when a single worker serves every request of a user.
+    """
+
+    def __init__(self, max_entries=10000, sweep_interval=60):
+        self.cache = TTLCache(3600, max_entries=max_entries, sweep_interval=sweep_interval)
+
+    def load(self, sid):
+        return self.cache.get(sid)
+
+    def save(self, sid, payload, ttl):
+        self.cache.set(sid, payload, ttl=ttl)
+
+    def delete(self, sid):
+        self.cache.pop(sid)
+
+    def sweep(self):
+        return self.cache.sweep()
+
+
+class DatabaseSessionStore:
+    """
+    Session store kept in the application database, shared by every gunicorn worker.
+    Expired rows are filtered out on read and purged opportunistically on write.
+    """
+
+    def __init__(self, db, sweep_interval=300):
+        self.db = db
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self.init_table()
+
+    def init_table(self):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, sid):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT data FROM sessions WHERE sid = ? AND expires_at > ?', (sid, time.time()))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def save(self, sid, payload, ttl):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            # One upsert: concurrent requests of one session would both pass
+            # a DELETE and then collide on INSERT
+            cursor.execute('''
+                INSERT INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+            ''', (sid, payload, time.time() + ttl))
+            conn.commit()
+        finally:
+            conn.close()
+
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self.sweep()
+
+    def delete(self, sid):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def sweep(self):
+        """Delete every expired session, returns the number removed"""
+        self._last_sweep = time.time()
+        try:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+                removed = cursor.rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            return removed
+        except Exception as e:
+            logger.error(f"Session sweep failed: {str(e)}")
+            return 0
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data in a store and only an opaque random id in the cookie.
+    The store and the cookie are written only when the session changed
+    (or on every request if SESSION_REFRESH_EACH_REQUEST is set), so plain
+    page views cost one lookup and no signing or Set-Cookie.
+    """
+
+    session_class = ServerSession
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            payload = self.store.load(sid)
+            if payload is not None:
+                try:
+                    return self.session_class(self.serializer.loads(payload), sid=sid)
+                except Exception as e:
+                    logger.warning(f"Discarding unreadable session: {str(e)}")
+        # Unknown or expired ids are never adopted, so a planted cookie cannot fix the session id
+        return self.session_class(sid=_new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            # Cleared (logout): drop the stored data and the cookie
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), ttl)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+        response.vary.add('Cookie')
+
+
+def create_session_interface(config, db=None):
+    """Build the session interface for config.SESSION_STORE ('memory' or 'database')"""
+    backend = getattr(config, 'SESSION_STORE', 'database')
+
+    if backend == 'database':
+        if db is None:
+            raise ValueError("The 'database' session store needs a Database instance")
+        return ServerSideSessionInterface(DatabaseSessionStore(db))
+    if backend == 'memory':
+        return ServerSideSessionInterface(
+            MemorySessionStore(max_entries=getattr(config, 'SESSION_MAX_ENTRIES', 10000)))
+    raise ValueError(f"Unknown SESSION_STORE: {backend}")
@@ -0,0 +1,217 @@
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+import numpy as np
+import logging
+from utils.face_matcher import BusGallery, poll_changes, gallery_rows, read_changes
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = 'CURRENT.json'
+LOCK_FILE = 'publish.lock'
+# Superseded versions are kept this long (seconds) before cleanup deletes them
+CLEANUP_GRACE_PERIOD = 300
+
+
+class SharedGalleryCache:
+    """
+    Gallery of every bus published once into a memory-mapped float32 .npy
+    file, with a JSON id index alongside, shared read-only by all workers.
+
+    Each version is a new pair of files; CURRENT.json names the live one and
+    is replaced atomically. A worker that sees the change log move past the
+    published version takes a file lock, publishes a new version (as a delta
+    on top of the previous one when possible) and everyone else maps it.
+    Mapping is zero-copy: all workers share the page cache, and each bus
+    gallery is a slice of the one mapped matrix. Workers map under a shared
+    lock, so a publish never deletes files between reading the pointer and
+    opening them.
+    """
+
+    def __init__(self, db, directory, default_threshold=0.6, grace_period=CLEANUP_GRACE_PERIOD):
+        self.db = db
+        self.directory = directory
+        self.default_threshold = default_threshold
+        self.grace_period = grace_period
+        self._mapped = None  # (pointer dict, {bus_number: BusGallery})
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_pointer(self):
+        try:
+            with open(self._path(POINTER_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_current(pointer, latest, epoch):
+        return pointer is not None and pointer['epoch'] == epoch and pointer['seq'] >= latest
+
+    def _map(self, pointer):
+        version = pointer['version']
+        with open(self._path(f'gallery-{version}.json')) as f:
+            index = json.load(f)
+        matrix = np.load(self._path(f'gallery-{version}.npy'), mmap_mode='r')
+        thresholds = np.array(index['thresholds'], dtype=np.float64)
+
+        galleries = {}
+        for bus_number, (start, end) in index['buses'].items():
+            galleries[int(bus_number)] = BusGallery(index['university_ids'][start:end],
+                                                    index['names'][start:end],
+                                                    matrix[start:end], thresholds[start:end])
+        logger.info(f"Mapped shared gallery {version}: {len(index['university_ids'])} students")
+        return pointer, galleries
+
+    def _decode(self, rows):
+        ids, names, buses, thresholds, encodings = [], [], [], [], []
+        for university_id, name, stored_encoding, threshold, bus_number in rows:
+            try:
+                encodings.append(np.array(json.loads(stored_encoding), dtype=np.float32))
+            except Exception:
+                logger.warning(f"Failed to decode face encoding for {university_id}")
+                continue
+            ids.append(university_id)
+            names.append(name)
+            buses.append(bus_number)
+            thresholds.append(self.default_threshold if threshold is None else threshold)
+        matrix = np.vstack(encodings) if encodings else np.empty((0, 128), dtype=np.float32)
+        return ids, names, buses, thresholds, matrix
+
+    def _build(self, cursor, previous, oldest, epoch):
+        """Full rebuild, or previous version + the change-log delta since it was published"""
+        if previous is not None and previous['epoch'] == epoch and (oldest is None or oldest <= previous['seq'] + 1):
+            version = previous['version']
+            with open(self._path(f'gallery-{version}.json')) as f:
+                index = json.load(f)
+            old_matrix = np.load(self._path(f'gallery-{version}.npy'), mmap_mode='r')
+
+            touched, rows, _ = read_changes(cursor, previous['seq'])
+            keep = [i for i, uid in enumerate(index['university_ids']) if uid not in touched]
+            ids, names, buses, thresholds, matrix = self._decode(rows)
+            bus_of = {}
+            for bus_number, (start, end) in index['buses'].items():
+                for i in range(start, end):
+                    bus_of[i] = int(bus_number)
+
+            ids = [index['university_ids'][i] for i in keep] + ids
+            names = [index['names'][i] for i in keep] + names
+            buses = [bus_of[i] for i in keep] + buses
+            thresholds = [index['thresholds'][i] for i in keep] + thresholds
+            matrix = np.vstack([np.asarray(old_matrix[keep], dtype=np.float32), matrix])
+        else:
+            ids, names, buses, thresholds, matrix = self._decode(gallery_rows(cursor, '1 = 1', ()))
+
+        # Contiguous rows per bus so each bus gallery is a view of the mapping
+        order = np.argsort(np.array(buses, dtype=np.int64), kind='stable')
+        ids = [ids[i] for i in order]
+        names = [names[i] for i in order]
+        buses = [buses[i] for i in order]
+        thresholds = [float(thresholds[i]) for i in order]
+        matrix = np.ascontiguousarray(matrix[order], dtype=np.float32)
+
+        ranges = {}
+        for i, bus_number in enumerate(buses):
+            start, _ = ranges.get(bus_number, (i, i))
+            ranges[bus_number] = (start, i + 1)
+
+        return {'university_ids': ids, 'names': names, 'thresholds': thresholds,
+                'buses': {str(b): r for b, r in ranges.items()}}, matrix
+
+    def _publish(self, cursor, previous, latest, oldest, epoch):
+        index, matrix = self._build(cursor, previous, oldest, epoch)
+
+        # Never overwrite files another worker may have mapped
+        version = f'{latest}-{epoch}-{uuid.uuid4().hex[:8]}'
+        tmp = self._path(f'.tmp-{version}')
+        with open(tmp, 'wb') as f:
+            np.save(f, matrix)
+        os.replace(tmp, self._path(f'gallery-{version}.npy'))
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self._path(f'gallery-{version}.json'))
+
+        pointer = {'version': version, 'seq': latest, 'epoch': epoch}
+        with open(tmp, 'w') as f:
+            json.dump(pointer, f)
+        os.replace(tmp, self._path(POINTER_FILE))
+
+        self._cleanup(keep={version, previous['version'] if previous else None})
+        logger.info(f"Published shared gallery {version}: {len(index['university_ids'])} students")
+        return pointer
+
+    def _cleanup(self, keep):
+        # Unlinking a file that is still mapped elsewhere is safe on POSIX;
+        # superseded versions stay for the grace period all the same
+        cutoff = time.time() - self.grace_period
+        for filename in os.listdir(self.directory):
+            if filename.startswith('gallery-'):
+                version = filename[len('gallery-'):].rsplit('.', 1)[0]
+                if version not in keep:
+                    try:
+                        if os.path.getmtime(self._path(filename)) < cutoff:
+                            os.remove(self._path(filename))
+                    except OSError:
+                        pass
+
+    def _ensure(self, cursor, latest, oldest, epoch):
+        # Publishers hold the lock exclusively, so the files the pointer names
+        # exist for as long as we hold it shared
+        with open(self._path(LOCK_FILE), 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            try:
+                pointer = self._read_pointer()
+                mapped = self._map(pointer) if self._is_current(pointer, latest, epoch) else None
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+            if mapped is None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    # Another worker may have published while we waited
+                    pointer = self._read_pointer()
+                    if not self._is_current(pointer, latest, epoch):
+                        pointer = self._publish(cursor, pointer, latest, oldest, epoch)
+                    mapped = self._map(pointer)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+        # Atomic swap: in-flight scans keep the galleries they already hold
+        self._mapped = mapped
+        return mapped
+
+    def _current(self):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            latest, oldest, epoch = poll_changes(cursor)
+            mapped = self._mapped
+            if mapped is None or not self._is_current(mapped[0], latest, epoch):
+                with self._lock:
+                    mapped = self._mapped
+                    if mapped is None or not self._is_current(mapped[0], latest, epoch):
+                        mapped = self._ensure(cursor, latest, oldest, epoch)
+            return mapped
+        finally:
+            conn.close()
+
+    def get(self, bus_number):
+        """Return the up-to-date gallery for a bus"""
+        gallery = self._current()[1].get(bus_number)
+        if gallery is None:
+            return BusGallery([], [], np.empty((0, 128), dtype=np.float32), np.empty(0))
+        return gallery
+
+    def invalidate(self, bus_number=None):
+        """Drop the mapping; the next lookup maps the current version again"""
+        self._mapped = None
+
+    def preload_all(self):
+        """Map (publishing if needed) the shared gallery, returns the number of buses"""
+        return len(self._current()[1])
@@ -0,0 +1,90 @@
+import json
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Offline calibration of per-student and per-bus match thresholds.
+# Scans pick the nearest student of the bus, so the threshold only decides
+# accept vs reject. A student whose nearest other student is far away can
+# safely accept looser matches (fewer false rejects and rescans); a student
+# with a look-alike on the same bus gets a stricter threshold.
+
+
+def pairwise_distances(matrix):
+    """Euclidean distance matrix between the rows of matrix (Gram trick, no Python loops)"""
+    squared = np.einsum('ij,ij->i', matrix, matrix)
+    d2 = squared[:, None] + squared[None, :] - 2.0 * (matrix @ matrix.T)
+    np.maximum(d2, 0.0, out=d2)
+    return np.sqrt(d2)
+
+
+def calibrate_gallery(matrix, default, margin, lower, upper):
+    """
+    matrix: (N, 128) encodings of one bus
+    Returns: (bus threshold, per-student thresholds array)
+    """
+    n = len(matrix)
+    if n < 2:
+        return default, np.full(n, default)
+
+    distances = pairwise_distances(matrix)
+    np.fill_diagonal(distances, np.inf)
+
+    nearest_other = distances.min(axis=1)
+    student_thresholds = np.clip(nearest_other - margin, lower, upper)
+
+    # Bus-wide fallback for students enrolled after calibration: keep clear
+    # of the closest 1% of pairs in this bus
+    inter_class = distances[np.triu_indices(n, k=1)]
+    bus_threshold = float(np.clip(np.percentile(inter_class, 1) - margin, lower, upper))
+    return bus_threshold, student_thresholds
+
+
+def calibrate_thresholds(db, config, bus_numbers=None):
+    """
+    Recompute and store thresholds for the given buses (default: every bus with students)
+    Returns: {bus_number: (students calibrated, bus threshold)}
+    """
+    summary = {}
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        if bus_numbers is None:
+            cursor.execute('SELECT DISTINCT bus_number FROM students WHERE face_encoding IS NOT NULL')
+            bus_numbers = [row[0] for row in cursor.fetchall()]
+
+        for bus_number in bus_numbers:
+            cursor.execute('''
+                SELECT university_id, face_encoding FROM students
+                WHERE bus_number = ? AND face_encoding IS NOT NULL
+            ''', (bus_number,))
+
+            university_ids, encodings = [], []
+            for university_id, stored_encoding in cursor.fetchall():
+                try:
+                    encodings.append(np.array(json.loads(stored_encoding), dtype=np.float64))
+                    university_ids.append(university_id)
+                except Exception:
+                    logger.warning(f"Skipping undecodable encoding of {university_id}")
+
+            matrix = np.vstack(encodings) if encodings else np.empty((0, 128))
+            bus_threshold, student_thresholds = calibrate_gallery(
+                matrix, config.FACE_DISTANCE_THRESHOLD, config.FACE_THRESHOLD_MARGIN,
+                config.FACE_THRESHOLD_MIN, config.FACE_THRESHOLD_MAX)
+
+            cursor.execute('DELETE FROM face_thresholds WHERE bus_number = ?', (bus_number,))
+            cursor.executemany('''
+                INSERT INTO face_thresholds (bus_number, university_id, threshold)
+                VALUES (?, ?, ?)
+            ''', [(bus_number, '', bus_threshold)] +
+                 [(bus_number, uid, float(t)) for uid, t in zip(university_ids, student_thresholds)])
+            conn.commit()
+
+            summary[bus_number] = (len(university_ids), bus_threshold)
+    finally:
+        conn.close()
+
+    # Workers reload galleries (and with them the thresholds) on their next scan
+    db.bump_gallery_epoch()
+    return summary
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Bounded in-memory LRU cache whose entries also expire after a TTL.
+    Expired entries are dropped on access and by a background sweeper thread,
+    so abandoned keys do not accumulate.
+    """
+    
+    def __init__(self, ttl, max_entries=10000, sweep_interval=60):
+        """
+        ttl: default lifetime of an entry in seconds
+        max_entries: least recently used entries are evicted beyond this size
+        sweep_interval: seconds between background sweeps (None disables the thread)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._sweeper_pid = None
+    
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        self._ensure_sweeper()
+    
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None or item[0] <= time.time():
+            return default
+        return item[1]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def sweep(self):
+        """Drop every expired entry, returns the number removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+    
+    def _ensure_sweeper(self):
+        # Started lazily (and restarted after a fork) because threads do not
+        # survive gunicorn forking its workers from a preloaded app
+        if not self.sweep_interval:
+            return
+        if self._sweeper is not None and self._sweeper_pid == os.getpid() and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is not None and self._sweeper_pid == os.getpid() and self._sweeper.is_alive():
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='ttl-cache-sweeper', daemon=True)
+            self._sweeper_pid = os.getpid()
+            self._sweeper.start()
+    
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.debug(f"Swept {removed} expired cache entries")
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {str(e)}")
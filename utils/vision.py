@@ -0,0 +1,39 @@
+import threading
+
+# Lazily initialised face recognition objects.
+# Importing utils.face_encoder pulls in numpy and, on first use, dlib via
+# face_recognition; routes that never scan a face should not pay for that,
+# so they go through these accessors instead of importing the modules.
+
+_lock = threading.Lock()
+_face_encoder = None
+_gallery_cache = None
+
+def get_face_encoder():
+    """Shared FaceEncoder for this process, created on first use"""
+    global _face_encoder
+    if _face_encoder is None:
+        with _lock:
+            if _face_encoder is None:
+                from utils.face_encoder import FaceEncoder
+                _face_encoder = FaceEncoder()
+    return _face_encoder
+
+def get_gallery_cache(db=None):
+    """Shared GalleryCache for this process, created on first use"""
+    global _gallery_cache
+    if _gallery_cache is None:
+        with _lock:
+            if _gallery_cache is None:
+                from config import config
+                if db is None:
+                    from models.models import Database
+                    db = Database()
+                if config.GALLERY_BACKEND == 'shared':
+                    from utils.shared_gallery import SharedGalleryCache
+                    _gallery_cache = SharedGalleryCache(db, config.SHARED_GALLERY_DIR,
+                                                        default_threshold=config.FACE_DISTANCE_THRESHOLD)
+                else:
+                    from utils.face_matcher import GalleryCache
+                    _gallery_cache = GalleryCache(db, default_threshold=config.FACE_DISTANCE_THRESHOLD)
+    return _gallery_cache
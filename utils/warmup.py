@@ -0,0 +1,48 @@
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Readiness state of this worker, reported by the /ready endpoint
+warmup_state = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'duration_seconds': None,
+    'galleries_loaded': 0,
+    'error': None
+}
+
+def is_ready():
+    return warmup_state['ready']
+
+def mark_ready():
+    """Report ready without warming up (warm-up disabled)"""
+    warmup_state['ready'] = True
+    warmup_state['finished_at'] = time.time()
+
+def warm_up(face_encoder, gallery_cache):
+    """
+    Pay the one-off startup costs before this worker serves traffic:
+    import face_recognition and load the dlib models, run one dummy inference,
+    and prefetch every bus gallery.
+    """
+    start = time.time()
+    warmup_state['started_at'] = start
+    print("🔥 Warming up face recognition...")
+
+    try:
+        face_encoder.warm_up()
+        warmup_state['galleries_loaded'] = gallery_cache.preload_all()
+    except Exception as e:
+        warmup_state['error'] = str(e)
+        logger.error(f"Warm-up failed: {str(e)}")
+        print(f"❌ Warm-up failed: {str(e)}")
+        return False
+
+    warmup_state['finished_at'] = time.time()
+    warmup_state['duration_seconds'] = round(warmup_state['finished_at'] - start, 3)
+    warmup_state['ready'] = True
+    print(f"✅ Warm-up done in {warmup_state['duration_seconds']}s "
+          f"({warmup_state['galleries_loaded']} bus galleries)")
+    return True